@@ -0,0 +1 @@
+python src/batch_process.py data --cache output/cache/detections.sqlite
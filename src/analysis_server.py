@@ -0,0 +1,211 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from pii_detector import text_analyzer
+from pii_detector.pages import page_texts
+
+
+# Analyzer profiles a request can ask for; the first is the default
+TEXT_ANALYZER = "text_analyzer"  # text_analyzer.ANALYZER_CONFIG: Presidio + spaCy on en_core_web_trf (step2_analyze)
+PRESIDIO_DEFAULT = "presidio-default"  # Presidio's default AnalyzerEngine (step2_analyze_text, step2_parallel)
+ANALYZERS = [TEXT_ANALYZER, PRESIDIO_DEFAULT]
+
+
+def analyze_presidio_default(pages, batch_size):
+    """(page_num, text) pairs through Presidio's default AnalyzerEngine, windowed like the step2 scripts do.
+
+    Detections are {"type", "start", "end", "score"}, unresolved: the clients
+    turn them into their own output rows.
+    """
+    from pii_detector.chunking import analyze_many_chunked
+    from pii_detector.models import batch_analyzer, default_analyzer
+    batch = batch_analyzer(default_analyzer())
+
+    def analyze_windows(windows):
+        return [[{"type": r.entity_type, "start": r.start, "end": r.end, "score": r.score} for r in results]
+                for results in batch.analyze_iterator(windows, language="en", batch_size=batch_size)]
+
+    detections = analyze_many_chunked([text or "" for _, text in pages], analyze_windows)
+    return [{"page_number": page_num, "detections": page_detections}
+            for (page_num, _), page_detections in zip(pages, detections)]
+
+
+class Batcher:
+    """Collects pages from concurrent requests and analyzes them together in one nlp.pipe call.
+
+    The first waiting request starts a batch; others arriving within max_wait
+    seconds join it, up to batch_size pages. One Batcher per analyzer profile.
+    """
+
+    def __init__(self, analyzer=TEXT_ANALYZER, gpu_id=0, batch_size=64, max_wait=0.02):
+        self.analyzer = analyzer
+        self.gpu_id = gpu_id
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.started = time.time()
+        self.requests = 0
+        self.pages = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.analyze_seconds = 0.0
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, pages):
+        """Analyze (page_num, text) pairs; blocks until their batch is done."""
+        future = Future()
+        self._queue.put((pages, future))
+        return future.result()
+
+    def _collect(self):
+        pending = [self._queue.get()]
+        count = len(pending[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while count < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            pending.append(item)
+            count += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            pages = [page for request_pages, _ in pending for page in request_pages]
+            t0 = time.time()
+            try:
+                if self.analyzer == PRESIDIO_DEFAULT:
+                    results = analyze_presidio_default(pages, self.batch_size)
+                else:
+                    results = list(text_analyzer.analyze_pages(pages, gpu_id=self.gpu_id, batch_size=self.batch_size))
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            self.analyze_seconds += time.time() - t0
+
+            start = 0
+            for request_pages, future in pending:
+                future.set_result(results[start:start + len(request_pages)])
+                start += len(request_pages)
+
+            self.requests += len(pending)
+            self.pages += len(pages)
+            self.batches += 1
+            self.largest_batch = max(self.largest_batch, len(pages))
+
+    def stats(self):
+        stats = {
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "requests": self.requests,
+            "pages": self.pages,
+            "batches": self.batches,
+            "pages_per_batch": round(self.pages / self.batches, 1) if self.batches else 0,
+            "largest_batch": self.largest_batch,
+            "queued_requests": self._queue.qsize(),
+            "analyze_seconds": round(self.analyze_seconds, 2),
+            "pages_per_second": round(self.pages / self.analyze_seconds, 1) if self.analyze_seconds else 0,
+        }
+        if self.analyzer == TEXT_ANALYZER and text_analyzer._cache is not None:
+            stats["cache"] = text_analyzer._cache.stats()
+        return stats
+
+
+class AnalysisHandler(BaseHTTPRequestHandler):
+    """GET /health, GET /stats, POST /analyze with {"pages": [[page_num, text], ...]} or {"document": step1 data}.
+
+    An optional "analyzer" field picks the profile (see ANALYZERS); the default is text_analyzer.
+    """
+
+    def do_GET(self):
+        if self.path == "/health":
+            gpu_id = self.server.gpu_id
+            self._send(200, {"status": "ok", "model": text_analyzer.MODEL_NAME, "analyzers": ANALYZERS,
+                             "device": "cpu" if gpu_id is None else f"gpu:{gpu_id}"})
+        elif self.path == "/stats":
+            self._send(200, {name: batcher.stats() for name, batcher in self.server.batchers.items()})
+        else:
+            self._send(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/analyze":
+            self._send(404, {"error": f"unknown path {self.path}"})
+            return
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            if "document" in payload:
+                pages = page_texts(payload["document"])
+            else:
+                pages = [(page_num, text) for page_num, text in payload["pages"]]
+            batcher = self.server.batchers[payload.get("analyzer") or TEXT_ANALYZER]
+        except (ValueError, KeyError, TypeError) as e:
+            self._send(400, {"error": f"bad request: {e!r}"})
+            return
+        try:
+            results = batcher.submit(pages)
+        except Exception as e:
+            self._send(500, {"error": repr(e)})
+            return
+        self._send(200, {"results": results})
+
+    def _send(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep the analyzer loaded and serve PII detection over local HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--gpu-id", type=int, default=0, help="GPU to load the model on (-1 = CPU)")
+    parser.add_argument("--batch-size", type=int, default=64, help="most pages analyzed in one nlp.pipe call")
+    parser.add_argument("--max-wait-ms", type=float, default=20,
+                        help="how long a batch waits for other requests to join it")
+    parser.add_argument("--cache", default=None, help="SQLite detection cache path (reuses results for unchanged pages)")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    gpu_id = None if args.gpu_id < 0 else args.gpu_id
+    text_analyzer.set_cache(args.cache)
+
+    print(f"Loading {text_analyzer.MODEL_NAME}...")
+    t0 = time.time()
+    text_analyzer.init_on_gpu(gpu_id)
+    print(f"Model ready in {time.time() - t0:.1f}s")
+
+    server = ThreadingHTTPServer((args.host, args.port), AnalysisHandler)
+    server.gpu_id = gpu_id
+    # The presidio-default profile loads its model on its first request
+    server.batchers = {name: Batcher(name, gpu_id, args.batch_size, args.max_wait_ms / 1000) for name in ANALYZERS}
+    server.verbose = args.verbose
+    print(f"Serving on http://{args.host}:{args.port} (POST /analyze, GET /health, GET /stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if text_analyzer._cache is not None:
+            text_analyzer._cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import argparse
+import glob
+import os
+import time
+from multiprocessing import get_context
+from pathlib import Path
+
+from pii_detector.dedup import analyze_deduplicated
+from pii_detector.extract import extract_document
+from pii_detector.pages import save_detections
+from pii_detector.worker_pool import AnalyzerPool
+from step1_extract import page_record, save_step1
+
+
+def find_pdfs(inputs):
+    """PDF paths from a mix of files, directories (searched recursively) and glob patterns."""
+    found = []
+    for item in inputs:
+        if os.path.isdir(item):
+            found += sorted(str(p) for p in Path(item).rglob("*") if p.suffix.lower() == ".pdf")
+        elif glob.has_magic(item):
+            found += sorted(glob.glob(item, recursive=True))
+        else:
+            found.append(item)
+    return list(dict.fromkeys(found))
+
+
+def batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def process_batch(pdf_paths, extract_pool, analyzer_pool, output_dir, totals, binary=False, dedup=False):
+    """Extract and analyze a group of PDFs; pages of all of them share the analyzer pool's queue.
+
+    With dedup=True text repeated across the group's pages (boilerplate shared
+    by several documents included) is analyzed once.
+    """
+    t0 = time.time()
+    documents = []
+    for pdf_path, texts, error in extract_pool.imap_unordered(extract_document, pdf_paths):
+        if error:
+            print(f"  Skipping {pdf_path}: {error}")
+            totals["failed"] += 1
+            continue
+        data = save_step1(pdf_path, [page_record(i, text) for i, text in enumerate(texts)],
+                          output_dir / "step1" / f"{Path(pdf_path).stem}_text.json")
+        documents.append((pdf_path, data))
+    t1 = time.time()
+
+    # One flat page list, so the pool schedules pages longest first across every document
+    pages = [(p["page_number"], p["text"]) for _, data in documents for p in data["pages"]]
+    results = analyze_deduplicated(pages, analyzer_pool.analyze) if dedup else analyzer_pool.analyze(pages)
+    t2 = time.time()
+
+    start = 0
+    for pdf_path, data in documents:
+        count = len(data["pages"])
+        save_detections(data, results[start:start + count], Path(pdf_path).stem, output_dir / "step2", binary)
+        start += count
+
+    totals["documents"] += len(documents)
+    totals["pages"] += len(pages)
+    totals["chars"] += sum(len(text) for _, text in pages)
+    totals["extract_seconds"] += t1 - t0
+    totals["analyze_seconds"] += t2 - t1
+
+
+def print_summary(totals, elapsed):
+    print(f"\nDocuments: {totals['documents']} ({totals['failed']} failed)")
+    print(f"Pages:     {totals['pages']} ({totals['chars'] / 1e6:.1f}M chars)")
+    print(f"Extract:   {totals['extract_seconds']:.1f}s")
+    print(f"Analyze:   {totals['analyze_seconds']:.1f}s")
+    print(f"Total:     {elapsed:.1f}s, {totals['pages'] / max(elapsed, 1e-9):.1f} pages/s, "
+          f"{totals['documents'] / max(elapsed, 1e-9):.2f} documents/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract and analyze many PDFs with one set of warmed workers.")
+    parser.add_argument("inputs", nargs="+", help="PDF files, directories or glob patterns")
+    parser.add_argument("--output-dir", type=Path, default=Path("output"),
+                        help="step1/ and step2/ outputs are written under this directory")
+    parser.add_argument("--num-gpus", type=int, default=3, help="GPUs to spread workers over (0 = CPU only)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="analyzer processes (default: one per GPU, or one per CPU core)")
+    parser.add_argument("--extract-workers", type=int, default=os.cpu_count(), help="PDF text extraction processes")
+    parser.add_argument("--cpu-affinity", action="store_true", help="pin each analyzer worker to its own set of cores")
+    parser.add_argument("--docs-per-batch", type=int, default=200,
+                        help="documents extracted and analyzed together (bounds memory)")
+    parser.add_argument("--cache", default=None, help="SQLite detection cache path (reuses results for unchanged pages)")
+    parser.add_argument("--format", choices=["json", "dets"], default="json",
+                        help="step2 output: indented JSON or the compact binary .dets format")
+    parser.add_argument("--dedup", action="store_true",
+                        help="analyze duplicate pages and repeated headers, footers and disclaimers only once")
+    args = parser.parse_args()
+
+    pdf_paths = find_pdfs(args.inputs)
+    if not pdf_paths:
+        print("No PDF files found")
+        return
+    stems = [Path(p).stem for p in pdf_paths]
+    if len(set(stems)) != len(stems):
+        print("Warning: some PDFs share a file name; their outputs will overwrite each other")
+    (args.output_dir / "step1").mkdir(parents=True, exist_ok=True)
+    print(f"Processing {len(pdf_paths)} PDF(s)...")
+
+    totals = {"documents": 0, "failed": 0, "pages": 0, "chars": 0, "extract_seconds": 0.0, "analyze_seconds": 0.0}
+    started = time.time()
+    with get_context("spawn").Pool(args.extract_workers) as extract_pool, \
+            AnalyzerPool(num_workers=args.workers, num_gpus=args.num_gpus, cpu_affinity=args.cpu_affinity,
+                         cache_path=args.cache) as analyzer_pool:
+        for batch in batches(pdf_paths, args.docs_per_batch):
+            process_batch(batch, extract_pool, analyzer_pool, args.output_dir, totals, args.format == "dets",
+                          args.dedup)
+            print(f"  {totals['documents'] + totals['failed']}/{len(pdf_paths)} documents done")
+
+    print_summary(totals, time.time() - started)
+
+
+if __name__ == "__main__":
+    main()
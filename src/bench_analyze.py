@@ -0,0 +1,90 @@
+import json
+import random
+import sys
+import time
+
+from pii_detector import text_analyzer
+
+FIRST_NAMES = ["John", "Maria", "Ivan", "Elena", "Peter", "Anna", "George", "Sofia"]
+LAST_NAMES = ["Smith", "Petrova", "Ivanov", "Johnson", "Georgiev", "Miller"]
+CITIES = ["Sofia", "London", "Plovdiv", "Berlin", "Varna", "Paris"]
+COMPANIES = ["Acme Ltd", "Globex Corporation", "Initech AD", "Umbrella Holdings"]
+
+
+def build_corpus(num_pages=50, seed=42):
+    """Deterministic synthetic corpus so runs are comparable across commits."""
+    rnd = random.Random(seed)
+    pages = []
+    for page_num in range(1, num_pages + 1):
+        lines = []
+        for _ in range(rnd.randint(10, 40)):
+            name = f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}"
+            lines.append(
+                f"{name} of {rnd.choice(COMPANIES)}, {rnd.choice(CITIES)}, can be reached at "
+                f"{name.split()[0].lower()}@example.com or 555-{rnd.randint(1000, 9999)}. "
+                f"Card on file: 4111 1111 1111 {rnd.randint(1000, 9999)}."
+            )
+        pages.append({"page_number": page_num, "text": "\n".join(lines)})
+    return pages
+
+
+def load_corpus(path):
+    """Load pages from a step1 JSON file (either step1 output shape)."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    pages = data["pages"] if isinstance(data, dict) else data
+    return [{"page_number": p["page_number"], "text": p.get("text", p.get("content", ""))} for p in pages]
+
+
+def run_shared(pages, baseline):
+    """Current path: one spaCy pass per page, shared with Presidio."""
+    for p in pages:
+        text_analyzer.analyze_text((p["page_number"], p["text"], 0))
+
+
+def build_baseline():
+    """The previous analyzer setup: Presidio's default NLP engine (en_core_web_lg) with the same recognizers,
+    and a separate en_core_web_trf pipeline for the spaCy pass. Returns (analyzer, nlp)."""
+    import spacy
+    from presidio_analyzer import AnalyzerEngine, Pattern, PatternRecognizer, RecognizerRegistry
+
+    registry = RecognizerRegistry()
+    registry.load_predefined_recognizers()
+    registry.recognizers = [r for r in registry.recognizers if r.name not in text_analyzer.EXCLUDED_RECOGNIZERS]
+    analyzer = AnalyzerEngine(registry=registry)
+    for entity, name, regex, score in text_analyzer.CUSTOM_PATTERNS:
+        pattern = Pattern(name=name, regex=regex, score=score)
+        analyzer.registry.add_recognizer(PatternRecognizer(supported_entity=entity, patterns=[pattern]))
+    return analyzer, spacy.load(text_analyzer.MODEL_NAME)
+
+
+def run_two_pass(pages, baseline):
+    """Previous path: Presidio's own spaCy pass (en_core_web_lg) plus a second en_core_web_trf pass."""
+    analyzer, nlp = baseline
+    for p in pages:
+        text = p["text"]
+        analyzer.analyze(text=text, language="en")
+        nlp(text[:50000])
+
+
+def main():
+    corpus_path = sys.argv[1] if len(sys.argv) > 1 else None
+    pages = load_corpus(corpus_path) if corpus_path else build_corpus()
+    total_chars = sum(len(p["text"]) for p in pages)
+    print(f"Corpus: {len(pages)} pages, {total_chars} chars")
+
+    # Load and warm up both setups, so model loading and first-call costs are not part of the measurement
+    text_analyzer.init_on_gpu(0)
+    text_analyzer.analyze_text((1, pages[0]["text"], 0))
+    baseline = build_baseline()
+    run_two_pass(pages[:1], baseline)
+
+    for name, fn in [("two-pass", run_two_pass), ("shared", run_shared)]:
+        start = time.perf_counter()
+        fn(pages, baseline)
+        elapsed = time.perf_counter() - start
+        print(f"{name:10s} {elapsed:8.2f}s  {len(pages) / elapsed:8.2f} pages/sec")
+
+
+if __name__ == "__main__":
+    main()
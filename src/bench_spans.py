@@ -0,0 +1,84 @@
+import argparse
+import random
+import time
+
+from pii_detector.spans import RULES, _rank_key, resolve
+
+TYPES = ["PERSON", "ORG", "GPE", "LOCATION", "PHONE_NUMBER", "CREDIT_CARD", "EMAIL_ADDRESS", "DATE_TIME", "NRP"]
+SOURCES = ["presidio", "spacy", "regex", "llm"]
+
+
+def build_page(num_spans, seed, text_chars=None):
+    """Candidate spans as a dense page produces them: runs of nested, duplicated and chained overlaps."""
+    rnd = random.Random(seed)
+    text_chars = text_chars or num_spans * 12
+    detections = []
+    while len(detections) < num_spans:
+        anchor = rnd.randrange(text_chars)
+        for _ in range(rnd.randint(1, 6)):  # several recognizers firing around the same entity
+            start = max(0, anchor + rnd.randint(-15, 15))
+            end = start + rnd.randint(2, 40)
+            detections.append({"type": rnd.choice(TYPES), "text": "x" * (end - start), "start": start, "end": end,
+                               "score": round(rnd.random(), 2), "source": rnd.choice(SOURCES)})
+    return detections[:num_spans]
+
+
+def resolve_pairwise(detections, rules=RULES):
+    """Reference resolver: same ranking, every candidate checked against every kept span. O(n^2)."""
+    min_score = rules.get("min_score", {})
+    kept = []
+    for d in sorted(detections, key=_rank_key(rules)):
+        if d["end"] <= d["start"] or d.get("score", 0) < min_score.get(d["type"], 0):
+            continue
+        if all(d["end"] <= k["start"] or k["end"] <= d["start"] for k in kept):
+            kept.append(d)
+    return sorted(kept, key=lambda d: d["start"])
+
+
+def exact_dedup(detections):
+    """The old text_analyzer behaviour: only identical (start, end) spans collapse."""
+    seen = {}
+    for d in detections:
+        key = (d["start"], d["end"])
+        if key not in seen or d["score"] > seen[key]["score"]:
+            seen[key] = d
+    return list(seen.values())
+
+
+def best_time(fn, pages, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for page in pages:
+            fn(page)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark span resolution on pages with many candidate spans.")
+    parser.add_argument("--spans", type=int, nargs="+", default=[1000, 5000, 20000], help="candidate spans per page")
+    parser.add_argument("--pages", type=int, default=5, help="pages per size")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (best is reported)")
+    parser.add_argument("--pairwise-limit", type=int, default=5000,
+                        help="largest page size to also run (and cross-check) the O(n^2) reference on")
+    args = parser.parse_args()
+
+    print(f"{'spans/page':>10s} {'kept':>7s} {'exact dedup':>12s} {'sweep':>10s} {'pairwise':>10s} {'spans/s':>11s}")
+    for num_spans in args.spans:
+        pages = [build_page(num_spans, seed) for seed in range(args.pages)]
+        kept = sum(len(resolve(page)) for page in pages) // len(pages)
+        dedup = best_time(exact_dedup, pages, args.repeat) / len(pages)
+        sweep = best_time(resolve, pages, args.repeat) / len(pages)
+        pairwise = "-"
+        if num_spans <= args.pairwise_limit:
+            for page in pages:
+                assert resolve(page) == resolve_pairwise(page), "sweep and pairwise results differ"
+            pairwise = f"{best_time(resolve_pairwise, pages, 1) / len(pages) * 1000:8.1f}ms"
+        print(f"{num_spans:10d} {kept:7d} {dedup * 1000:10.1f}ms {sweep * 1000:8.1f}ms {pairwise:>10s} "
+              f"{num_spans / sweep:11.0f}")
+
+
+if __name__ == "__main__":
+    main()
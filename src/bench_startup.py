@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+SCRIPTS = ["step2_analyze.py", "step2_analyze_text.py", "step2_parallel.py", "step2_multilingual.py",
+           "step2_v2.py", "step2_structured.py", "step2_client.py", "pipeline.py",
+           "step3_mask.py"]
+HEAVY_MODULES = ["torch", "spacy", "presidio_analyzer", "fitz"]
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+READY_SNIPPET = """
+import time
+t0 = time.perf_counter()
+from pii_detector import models
+analyzer = models.analyzer_for({language!r})
+analyzer.analyze(text="John Smith lives in London.", language={language!r})
+print(time.perf_counter() - t0)
+"""
+
+
+def timed_run(args, repeat):
+    """Best wall time of a fresh interpreter running args, or None if it fails."""
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = subprocess.run([sys.executable] + args, cwd=SRC_DIR, capture_output=True)
+        elapsed = time.perf_counter() - t0
+        if result.returncode != 0:
+            return None
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def ready_time(language):
+    """Seconds from a cold interpreter to the first analyzed sentence in `language`."""
+    result = subprocess.run([sys.executable, "-c", READY_SNIPPET.format(language=language)],
+                            cwd=SRC_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def fmt(seconds):
+    return "failed" if seconds is None else f"{seconds * 1000:8.0f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import, --help and model-ready times of the step scripts.")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (best is reported)")
+    parser.add_argument("--languages", nargs="*", default=["en"], help="languages to measure model-ready time for")
+    parser.add_argument("--output", default=None, help="append the results as one JSON line to this file")
+    args = parser.parse_args()
+
+    results = {"timestamp": time.strftime("%Y-%m-%d %H:%M:%S"), "python": sys.version.split()[0]}
+
+    baseline = timed_run(["-c", "pass"], args.repeat)
+    print(f"{'interpreter':28s} {fmt(baseline)}")
+    results["interpreter"] = baseline
+
+    print("\nImport (fresh interpreter):")
+    results["imports"] = {}
+    for module in HEAVY_MODULES:
+        seconds = timed_run(["-c", f"import {module}"], args.repeat)
+        results["imports"][module] = seconds
+        print(f"  {module:26s} {fmt(seconds) if seconds is not None else 'not installed'}")
+
+    print("\nScript --help:")
+    results["help"] = {}
+    for script in SCRIPTS:
+        seconds = timed_run([script, "--help"], args.repeat)
+        results["help"][script] = seconds
+        print(f"  {script:26s} {fmt(seconds)}")
+
+    print("\nModel ready (import + load + first page):")
+    results["ready"] = {}
+    for language in args.languages:
+        seconds = ready_time(language)
+        results["ready"][language] = seconds
+        print(f"  {language:26s} {fmt(seconds)}")
+
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(results) + "\n")
+        print(f"\nResults appended to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
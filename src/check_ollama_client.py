@@ -0,0 +1,100 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from pii_detector.ollama_client import AsyncOllamaClient, map_ordered
+
+
+class StubOllama(BaseHTTPRequestHandler):
+    """Mimics Ollama's /api/chat: echoes the user prompt back as the answer.
+
+    Prompts starting with "flaky" get a 503 on their first attempt, "notfound"
+    gets Ollama's plain-text 404, and replies are delayed at random so they
+    finish out of order.
+    """
+
+    protocol_version = "HTTP/1.1"  # keep-alive
+    connections = set()
+    attempts = {}
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = payload["messages"][-1]["content"]
+        with self.lock:
+            self.connections.add(self.client_address)
+            self.attempts[prompt] = self.attempts.get(prompt, 0) + 1
+            first_attempt = self.attempts[prompt] == 1
+        time.sleep(random.random() / 20)
+
+        if prompt.startswith("flaky") and first_attempt:
+            self._send(503, b"overloaded", "text/plain")
+        elif prompt.startswith("notfound"):
+            self._send(404, b"404 page not found", "text/plain")
+        elif payload["stream"]:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            tokens = [prompt[i:i + 3] for i in range(0, len(prompt), 3)]
+            lines = [{"message": {"content": token}, "done": False} for token in tokens] + [{"done": True}]
+            for line in lines:
+                data = json.dumps(line).encode("utf-8") + b"\n"
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self._send(200, json.dumps({"message": {"role": "assistant", "content": prompt}}).encode("utf-8"),
+                       "application/json")
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+async def run_checks(url):
+    prompts = [f"page {i}" for i in range(40)] + ["flaky page"]
+
+    async with AsyncOllamaClient(url, concurrency=4, backoff=0.01) as client:
+        results = [result async for result in map_ordered(lambda p: client.chat("system", p), prompts, 8)]
+    assert results == prompts, "results out of order or lost"
+    assert StubOllama.attempts["flaky page"] == 2, "503 not retried"
+    # One slot per concurrent request, plus the replacement for the connection dropped after the 503
+    assert len(StubOllama.connections) <= 5, f"{len(StubOllama.connections)} connections for 4 slots"
+    print(f"ordered results, 503 retried, {len(prompts)} requests over {len(StubOllama.connections)} connection(s)")
+
+    tokens = []
+    opened = len(StubOllama.connections)
+    async with AsyncOllamaClient(url, concurrency=1, stream=True) as client:
+        first = await client.chat("system", "streamed reply", on_token=tokens.append)
+        second = await client.chat("system", "on the same connection")
+    assert first == "streamed reply" and "".join(tokens) == first and len(tokens) > 1, "stream not joined"
+    assert second == "on the same connection", "reply after a chunked stream lost"
+    assert len(StubOllama.connections) == opened + 1, "connection not reused after a chunked reply"
+    print(f"chunked stream read in {len(tokens)} pieces, connection reused")
+
+    async with AsyncOllamaClient(url, retries=0) as client:
+        assert await client.chat("system", "notfound") is None, "plain-text error not returned as None"
+    print("plain-text 404 returned as None")
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOllama)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        asyncio.run(run_checks(f"http://127.0.0.1:{server.server_address[1]}"))
+    finally:
+        server.shutdown()
+    print("AsyncOllamaClient OK")
+
+
+if __name__ == "__main__":
+    main()
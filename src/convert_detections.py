@@ -0,0 +1,30 @@
+import argparse
+import json
+
+from pii_detector.detections import DETECTIONS_SUFFIX, read_detections, write_detections
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert step2 detections between JSON and the binary .dets format.")
+    parser.add_argument("input_file")
+    parser.add_argument("output_file", help="format is chosen by extension: .dets or .json")
+    args = parser.parse_args()
+
+    if args.input_file.endswith(DETECTIONS_SUFFIX):
+        data = read_detections(args.input_file)
+    else:
+        with open(args.input_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    pages = data["pages"] if isinstance(data, dict) else data
+
+    if args.output_file.endswith(DETECTIONS_SUFFIX):
+        batch = write_detections(args.output_file, data, pages)
+        print(f"{len(batch)} detections on {batch.page_count} pages written to {args.output_file}")
+    else:
+        with open(args.output_file, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        print(f"{len(pages)} pages written to {args.output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import argparse
+import json
+
+from pii_detector.extract import write_jsonl
+from pii_detector.page_store import STORE_SUFFIX, step1_to_store
+from pii_detector.pages import read_step1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert step1 output between JSON, JSONL and the .pages store.")
+    parser.add_argument("input_file")
+    parser.add_argument("output_file", help="format is chosen by extension: .pages, .jsonl or .json")
+    args = parser.parse_args()
+
+    if args.output_file.endswith(STORE_SUFFIX):
+        count = step1_to_store(read_step1(args.input_file), args.output_file)
+    else:
+        data = read_step1(args.input_file)
+        pages = data["pages"] if isinstance(data, dict) else data
+        count = len(pages)
+        if args.output_file.endswith(".jsonl"):
+            header = {k: v for k, v in data.items() if k != "pages"} if isinstance(data, dict) else None
+            write_jsonl(pages, args.output_file, header)
+        else:
+            with open(args.output_file, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+
+    print(f"{count} pages written to {args.output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import argparse
+import datetime
+
+from pii_detector.llm_cache import DEFAULT_LLM_CACHE_PATH, open_llm_cache
+from pii_detector.ollama_client import DEFAULT_MODEL
+
+
+def load_system_prompt(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def print_stats(cache):
+    stats = cache.stats()
+    print(f"{cache.path}: {stats['entries']} entries, {stats['bytes'] / 1e6:.1f} MB")
+    for ns in cache.namespace_stats():
+        last_used = datetime.datetime.fromtimestamp(ns["last_used"]).isoformat(" ", "seconds") if ns["last_used"] else "-"
+        marker = "*" if ns["current"] else " "
+        print(f" {marker} {ns['config']['model']:24s} prompt {ns['config']['system_prompt_sha256'][:12]}  "
+              f"{ns['entries']:7d} entries {ns['bytes'] / 1e6:8.1f} MB  last used {last_used}")
+    print("(* = current model and prompt)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and prune the LLM response cache.")
+    parser.add_argument("command", choices=["stats", "prune", "clear"])
+    parser.add_argument("--path", default=DEFAULT_LLM_CACHE_PATH)
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="current model (entries for others are stale)")
+    parser.add_argument("--prompt", default="prompts/system-prompt.txt", help="current system prompt file")
+    parser.add_argument("--max-mb", type=float, default=None, help="prune: also evict LRU entries down to this size")
+    args = parser.parse_args()
+
+    cache = open_llm_cache(args.path, args.model, load_system_prompt(args.prompt))
+
+    if args.command == "prune":
+        print(f"Deleted {cache.prune_stale()} entries for other models or prompts")
+        if args.max_mb is not None:
+            cache.shrink(int(args.max_mb * 1e6))
+    elif args.command == "clear":
+        cache.clear()
+        print("Cache cleared")
+
+    print_stats(cache)
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
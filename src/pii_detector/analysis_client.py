@@ -0,0 +1,52 @@
+import json
+import urllib.error
+import urllib.request
+
+SERVER_URL = "http://127.0.0.1:8765"
+
+
+class AnalysisServerError(Exception):
+    pass
+
+
+class AnalysisClient:
+    """Client for analysis_server.py. Uses only the standard library, so it imports instantly."""
+
+    def __init__(self, base_url=SERVER_URL, timeout=600):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, path, payload=None):
+        data = None if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        request = urllib.request.Request(self.base_url + path, data=data,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            raise AnalysisServerError(f"{path}: HTTP {e.code} {e.read().decode('utf-8', 'replace')}") from e
+        except urllib.error.URLError as e:
+            raise AnalysisServerError(f"analysis server not reachable at {self.base_url}: {e.reason}") from e
+
+    def analyze_pages(self, pages, analyzer=None):
+        """Analyze (page_num, text) pairs. Returns one {"page_number", "detections"} per page, in order.
+
+        analyzer picks the server's analyzer profile ("text_analyzer", the default, or "presidio-default").
+        """
+        payload = {"pages": [[page_num, text] for page_num, text in pages]}
+        if analyzer:
+            payload["analyzer"] = analyzer
+        return self._request("/analyze", payload)["results"]
+
+    def analyze_document(self, data, analyzer=None):
+        """Analyze parsed step1 output (either shape). Returns one result per page, in order."""
+        payload = {"document": data}
+        if analyzer:
+            payload["analyzer"] = analyzer
+        return self._request("/analyze", payload)["results"]
+
+    def health(self):
+        return self._request("/health")
+
+    def stats(self):
+        return self._request("/stats")
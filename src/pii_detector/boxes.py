@@ -0,0 +1,161 @@
+from pathlib import Path
+
+# numpy is imported where it is used: the step1 scripts import this module, and only need numpy with --boxes
+
+# Stored next to the step1 output: <stem>_text.boxes.npz
+BOXES_SUFFIX = ".boxes.npz"
+
+
+def boxes_path(step1_file):
+    """The box index path that belongs to a step1 file (.json, .jsonl or .pages)."""
+    step1_file = Path(step1_file)
+    return step1_file.with_name(step1_file.name[:-len(step1_file.suffix)] + BOXES_SUFFIX)
+
+
+def page_chars(page, textpage):
+    """Characters of the page in reading order: (char, bbox, line number)."""
+    chars = []
+    line_number = 0
+    for block in page.get_text("rawdict", textpage=textpage)["blocks"]:
+        for line in block.get("lines", ()):  # image blocks have no lines
+            line_number += 1
+            for span in line["spans"]:
+                for char in span["chars"]:
+                    chars.append((char["c"], char["bbox"], line_number))
+    return chars
+
+
+def align(text, chars):
+    """For each character of text, the index of the same character in chars, or -1.
+
+    get_text() is built from the same characters plus line and block breaks,
+    so a single forward walk lines them up.
+    """
+    positions = [-1] * len(text)
+    j = 0
+    for i, c in enumerate(text):
+        if j >= len(chars):
+            break
+        if c == chars[j][0]:
+            positions[i] = j
+            j += 1
+        elif c.isspace():
+            continue  # a break get_text() added
+        elif chars[j][0].isspace():
+            while j < len(chars) and chars[j][0].isspace() and chars[j][0] != c:
+                j += 1
+            if j < len(chars) and chars[j][0] == c:
+                positions[i] = j
+                j += 1
+        else:
+            j += 1  # same position, different character (e.g. a replacement character)
+    return positions
+
+
+class PageBoxes:
+    """Character boxes of one page, keyed by offset into the page's get_text() string.
+
+    offsets is sorted, so the characters of a span are found with two binary
+    searches; boxes is (n, 4) float32 and lines the text line of each box.
+    """
+
+    def __init__(self, offsets, boxes, lines):
+        self.offsets = offsets
+        self.boxes = boxes
+        self.lines = lines
+
+    def __len__(self):
+        return len(self.offsets)
+
+    @classmethod
+    def from_page(cls, page):
+        """(text, PageBoxes) for a PyMuPDF page, from one text extraction.
+
+        The text is the same string page.get_text() returns (and step1 writes):
+        get_textpage() alone would use different extraction flags.
+        """
+        import fitz
+        import numpy as np
+        textpage = page.get_textpage(flags=fitz.TEXTFLAGS_TEXT)
+        text = page.get_text("text", textpage=textpage)
+        chars = page_chars(page, textpage)
+        aligned = [(i, j) for i, j in enumerate(align(text, chars)) if j >= 0]
+        offsets = np.fromiter((i for i, _ in aligned), dtype=np.int32, count=len(aligned))
+        boxes = np.array([chars[j][1] for _, j in aligned], dtype=np.float32).reshape(-1, 4)
+        lines = np.fromiter((chars[j][2] for _, j in aligned), dtype=np.int32, count=len(aligned))
+        return text, cls(offsets, boxes, lines)
+
+    def rects(self, start, end):
+        """One (x0, y0, x1, y1) rectangle per text line the span [start, end) covers."""
+        import numpy as np
+        lo, hi = np.searchsorted(self.offsets, (start, end))
+        if lo == hi:
+            return []
+        boxes = self.boxes[lo:hi]
+        # Offsets follow reading order, so each line's boxes are one contiguous run
+        runs = np.concatenate(([0], np.flatnonzero(np.diff(self.lines[lo:hi])) + 1))
+        x0 = np.minimum.reduceat(boxes[:, 0], runs)
+        y0 = np.minimum.reduceat(boxes[:, 1], runs)
+        x1 = np.maximum.reduceat(boxes[:, 2], runs)
+        y1 = np.maximum.reduceat(boxes[:, 3], runs)
+        return [tuple(map(float, rect)) for rect in zip(x0, y0, x1, y1)]
+
+
+class BoxIndex:
+    """Character boxes of every page of a document, as a handful of flat arrays.
+
+    Built during step1 extraction (see step1_extract --boxes) and saved as an
+    .npz file next to the step1 output; text_lengths lets a reader check that
+    the index still matches the step1 text.
+    """
+
+    def __init__(self):
+        self.page_numbers = []
+        self.text_lengths = []
+        self._pages = {}
+
+    def add(self, page_number, text_length, page_boxes):
+        self.page_numbers.append(page_number)
+        self.text_lengths.append(text_length)
+        self._pages[page_number] = page_boxes
+
+    def __contains__(self, page_number):
+        return page_number in self._pages
+
+    def page(self, page_number):
+        return self._pages.get(page_number)
+
+    def save(self, path):
+        import numpy as np
+        pages = [self._pages[n] for n in self.page_numbers]
+        counts = [len(p) for p in pages]
+        np.savez_compressed(path,
+                            page_numbers=np.asarray(self.page_numbers, dtype=np.int32),
+                            text_lengths=np.asarray(self.text_lengths, dtype=np.int32),
+                            page_starts=np.concatenate(([0], np.cumsum(counts, dtype=np.int64))),
+                            offsets=np.concatenate([p.offsets for p in pages] or [np.zeros(0, np.int32)]),
+                            boxes=np.concatenate([p.boxes for p in pages] or [np.zeros((0, 4), np.float32)]),
+                            lines=np.concatenate([p.lines for p in pages] or [np.zeros(0, np.int32)]))
+
+    @classmethod
+    def load(cls, path, page_numbers=None):
+        """Load the index, or only the given pages of it; page arrays are views into the loaded columns."""
+        import numpy as np
+        index = cls()
+        with np.load(path) as data:
+            starts = data["page_starts"]
+            offsets, boxes, lines = data["offsets"], data["boxes"], data["lines"]
+            for k, (page_number, text_length) in enumerate(zip(data["page_numbers"].tolist(),
+                                                               data["text_lengths"].tolist())):
+                if page_numbers is not None and page_number not in page_numbers:
+                    continue
+                lo, hi = starts[k], starts[k + 1]
+                index.add(page_number, text_length, PageBoxes(offsets[lo:hi], boxes[lo:hi], lines[lo:hi]))
+        return index
+
+
+def indexed_text_lengths(path):
+    """{page_number: text length} of a saved index, without loading the boxes."""
+    import numpy as np
+    with np.load(path) as data:
+        return dict(zip(data["page_numbers"].tolist(), data["text_lengths"].tolist()))
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+EVICT_EVERY = 64  # puts between size checks
+
+
+def config_fingerprint(config):
+    """Stable hash of an analyzer config dict (models, recognizers, thresholds...)."""
+    return hashlib.sha256(json.dumps(config, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class DetectionCache:
+    """Content-addressed SQLite cache of per-page results.
+
+    Entries are keyed by sha256(config fingerprint + page text), so a config change
+    never returns stale detections. The store is capped at max_bytes and evicts the
+    least recently used entries first. Safe to share between threads and processes.
+    """
+
+    def __init__(self, path, config, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = str(path)
+        self.config = config
+        self.namespace = config_fingerprint(config)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            namespace TEXT NOT NULL,
+            value TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            last_used REAL NOT NULL)""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_namespace ON entries (namespace)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS namespaces (namespace TEXT PRIMARY KEY, config TEXT NOT NULL)")
+        self._conn.execute("INSERT OR IGNORE INTO namespaces (namespace, config) VALUES (?, ?)",
+                           (self.namespace, json.dumps(config, sort_keys=True, ensure_ascii=False)))
+        self._conn.commit()
+
+    def key(self, text):
+        return hashlib.sha256(f"{self.namespace}\0{text}".encode("utf-8")).hexdigest()
+
+    def get(self, text):
+        """Cached value for this text, or None."""
+        key = self.key(text)
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, text, value):
+        payload = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, namespace, value, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                (self.key(text), self.namespace, payload, len(payload), time.time()))
+            self._conn.commit()
+            self._puts += 1
+            if self._puts % EVICT_EVERY == 0:
+                self._evict()
+
+    def get_or_compute(self, text, compute):
+        """Return the cached value for text, computing and storing it on a miss."""
+        value = self.get(text)
+        if value is None:
+            value = compute(text)
+            self.put(text, value)
+        return value
+
+    def split(self, texts):
+        """Look up many texts. Returns ({index: cached value}, [indices of misses])."""
+        hits, misses = {}, []
+        for i, text in enumerate(texts):
+            value = self.get(text)
+            if value is None:
+                misses.append(i)
+            else:
+                hits[i] = value
+        return hits, misses
+
+    def _evict(self, max_bytes=None):
+        """Drop least recently used entries until the store is back under 90% of max_bytes."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= max_bytes:
+            return
+        target = total - int(max_bytes * 0.9)
+        freed = 0
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY last_used"):
+            doomed.append((key,))
+            freed += size
+            if freed >= target:
+                break
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+        self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+    def namespace_stats(self):
+        """Entries and bytes per namespace, with the config each namespace was created for."""
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT n.namespace, n.config, COUNT(e.key), COALESCE(SUM(e.size), 0), MAX(e.last_used)
+                FROM namespaces n LEFT JOIN entries e ON e.namespace = n.namespace
+                GROUP BY n.namespace ORDER BY MAX(e.last_used) DESC""").fetchall()
+        return [{"namespace": ns, "config": json.loads(config), "entries": entries, "bytes": size,
+                 "last_used": last_used, "current": ns == self.namespace}
+                for ns, config, entries, size, last_used in rows]
+
+    def prune_stale(self):
+        """Delete every entry written under a different config than this cache's. Returns the count."""
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM entries WHERE namespace != ?", (self.namespace,)).rowcount
+            self._conn.execute("DELETE FROM namespaces WHERE namespace != ?", (self.namespace,))
+            self._conn.commit()
+        return deleted
+
+    def shrink(self, max_bytes):
+        """Evict least recently used entries until the store fits in max_bytes."""
+        with self._lock:
+            self._evict(max_bytes)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._evict()
+            self._conn.close()
@@ -0,0 +1,65 @@
+import re
+
+# Presidio candidates scoring inside [low, high) are too uncertain to keep or drop without the LLM
+UNCERTAIN_LOW = 0.4
+UNCERTAIN_HIGH = 0.85
+
+# Dates only count as PII next to these words (see prompts/system-prompt.txt); Presidio can't judge that
+_DATE = r"(?:\d{1,2}[./-]\d{1,2}[./-]\d{2,4}|\d{4}-\d{2}-\d{2}|\d{1,2}\s+\w+\s+\d{4})"
+_DATE_KEYWORDS = (r"born|DOB|date of birth|issued|expires|expiry|valid until|"
+                  r"роден|родена|дата на раждане|издаден|издадена|валиден|валидна")
+_DATE_TRIGGER = re.compile(rf"\b(?:{_DATE_KEYWORDS})\b.{{0,60}}?\b{_DATE}\b", re.IGNORECASE | re.DOTALL)
+
+PARTIAL_NAME = "partial name"
+
+# Regex scanner types, renamed to the types the LLM prompt uses
+STRUCTURED_TYPES = {"BG_EGN": "NATIONAL_ID", "BG_LNCH": "NATIONAL_ID"}
+
+
+def partial_names(candidates):
+    """Single-word PERSON candidates: PII only if the full name appears elsewhere, which Presidio can't judge."""
+    return [c["value"] for c in candidates if c["type"] == "PERSON" and len(c["value"].split()) == 1]
+
+
+def llm_triggers(text, candidates, low=UNCERTAIN_LOW, high=UNCERTAIN_HIGH):
+    """Reasons this page needs the LLM; an empty list means the cheap pass is enough.
+
+    candidates are {"value", "type", "score"} dicts from the Presidio/regex pass.
+    """
+    reasons = []
+    uncertain = [c for c in candidates if low <= c["score"] < high]
+    if uncertain:
+        reasons.append(f"{len(uncertain)} uncertain candidate(s)")
+    if partial_names(candidates):
+        reasons.append(PARTIAL_NAME)
+    if _DATE_TRIGGER.search(text):
+        reasons.append("birth/document date")
+    return reasons
+
+
+def confident(candidates, high=UNCERTAIN_HIGH):
+    """Cheap-pass candidates that are kept without asking the LLM, in the LLM output format.
+
+    One item per (value, type), like merge(): repeated occurrences and the same
+    value found by both Presidio and the regex scanner keep the highest score.
+    """
+    items = {}
+    for c in candidates:
+        if c["score"] < high:
+            continue
+        pii_type = STRUCTURED_TYPES.get(c["type"], c["type"])
+        key = (c["value"], pii_type)
+        if key not in items or c["score"] > items[key]["score"]:
+            items[key] = {"value": c["value"], "type": pii_type, "is_full": True,
+                          "reason": f"{c.get('source', 'presidio')} score {round(c['score'], 3)}",
+                          "source": c.get("source", "presidio"), "score": c["score"]}
+    return list(items.values())
+
+
+def merge(cheap_items, llm_items):
+    """Union of both result sets. The LLM's verdict wins for a (value, type) both report."""
+    merged = {(item.get("value"), item.get("type")): item for item in cheap_items}
+    for item in llm_items:
+        if isinstance(item, dict):
+            merged[(item.get("value"), item.get("type"))] = item
+    return list(merged.values())
@@ -0,0 +1,108 @@
+import re
+
+CHUNK_CHARS = 20000
+OVERLAP_CHARS = 500
+
+# Sentence ends, blank lines and line breaks, strongest first
+_BOUNDARIES = [re.compile(r"[.!?]\s+"), re.compile(r"\n\s*\n"), re.compile(r"\n"), re.compile(r"\s+")]
+
+
+def _last_boundary(text, lo, hi):
+    """Position just after the last boundary in text[lo:hi], or hi if there is none."""
+    for pattern in _BOUNDARIES:
+        ends = [m.end() for m in pattern.finditer(text, lo, hi)]
+        if ends:
+            return ends[-1]
+    return hi
+
+
+def _first_boundary(text, lo, hi):
+    """Position just after the first boundary in text[lo:hi], or lo if there is none."""
+    for pattern in _BOUNDARIES:
+        m = pattern.search(text, lo, hi)
+        if m:
+            return m.end()
+    return lo
+
+
+def split_text(text, max_chars=CHUNK_CHARS, overlap=OVERLAP_CHARS):
+    """Split text into overlapping, sentence-aligned windows. Returns [(offset, chunk_text)].
+
+    Windows are at most max_chars long, end on a sentence (or line, or word) boundary
+    when one exists in their second half, and the next window starts on a boundary
+    inside the last `overlap` characters (always before the cut), so an entity cut
+    at one window's end is seen whole in the next.
+    """
+    if len(text) <= max_chars:
+        return [(0, text)]
+    overlap = min(overlap, max_chars // 4)
+
+    chunks = []
+    start = 0
+    while True:
+        end = start + max_chars
+        if end >= len(text):
+            chunks.append((start, text[start:]))
+            return chunks
+        end = _last_boundary(text, start + max_chars // 2, end)
+        chunks.append((start, text[start:end]))
+        # Searched short of the cut, so the next window always starts before it: when the cut is the
+        # only strong boundary in reach, a weaker one (a line break, a space) is used instead
+        start = _first_boundary(text, end - overlap, end - 1)
+
+
+def stitch(chunk_detections):
+    """Merge per-chunk detections that are already in page coordinates.
+
+    chunk_detections is one list of detection dicts per chunk. A detection that
+    overlaps one of the same type from another chunk is a boundary duplicate, and
+    only the longest of them (then the highest scoring) is kept.
+    """
+    tagged = sorted(
+        ((d["type"], d["start"], -d["end"], chunk_index, d)
+         for chunk_index, detections in enumerate(chunk_detections) for d in detections),
+        key=lambda t: t[:3])
+
+    kept = []
+    for entity_type, start, _, chunk_index, d in tagged:
+        if kept:
+            prev_type, prev_chunk, prev = kept[-1]
+            if prev_type == entity_type and prev_chunk != chunk_index and start < prev["end"]:
+                if (d["end"] - d["start"], d.get("score", 0)) > (prev["end"] - prev["start"], prev.get("score", 0)):
+                    kept[-1] = (entity_type, chunk_index, d)
+                continue
+        kept.append((entity_type, chunk_index, d))
+    return sorted((d for _, _, d in kept), key=lambda d: (d["start"], d["end"]))
+
+
+def shift(detections, offset):
+    """Move chunk-relative detections to page coordinates."""
+    if offset == 0:
+        return detections
+    return [dict(d, start=d["start"] + offset, end=d["end"] + offset) for d in detections]
+
+
+def analyze_chunked(text, analyze_fn, max_chars=CHUNK_CHARS, overlap=OVERLAP_CHARS):
+    """Run analyze_fn(chunk_text) -> detections over each window of text and stitch the results.
+
+    Windows are analyzed one after another; to analyze them in parallel, use
+    analyze_many_chunked, which batches them through nlp.pipe.
+    """
+    chunks = split_text(text, max_chars, overlap)
+    if len(chunks) == 1:
+        return analyze_fn(text)
+    return stitch([shift(analyze_fn(chunk), offset) for offset, chunk in chunks])
+
+
+def analyze_many_chunked(texts, analyze_batch_fn, max_chars=CHUNK_CHARS, overlap=OVERLAP_CHARS):
+    """Chunk every text, analyze all windows through one analyze_batch_fn(chunk_texts) call, regroup per text.
+
+    analyze_batch_fn returns (or yields) one detection list per window, in order, so
+    long pages ride in the same nlp.pipe batches as short ones. Yields one stitched
+    detection list per text, in order.
+    """
+    windows = [split_text(text, max_chars, overlap) for text in texts]
+    results = iter(analyze_batch_fn([chunk for text_windows in windows for _, chunk in text_windows]))
+    for text_windows in windows:
+        group = [shift(next(results), offset) for offset, _ in text_windows]
+        yield group[0] if len(group) == 1 else stitch(group)
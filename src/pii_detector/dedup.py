@@ -0,0 +1,189 @@
+import hashlib
+import re
+from bisect import bisect_right
+from collections import Counter
+
+# A line is boilerplate once it appears on this many distinct pages
+MIN_PAGES = 3
+# Runs of boilerplate lines with fewer non-space characters stay with their page, where NER has context
+MIN_BLOCK_CHARS = 20
+
+# Near-empty pages: punctuation and at most a page number ("- 12 -", "Page 3 of 40", "стр. 5")
+NEAR_EMPTY_CHARS = 32
+_NEAR_EMPTY = re.compile(r"\W*(?:(?:page|p\.|стр\.?|страница)\s*)?"
+                         r"\d{0,4}(?:\s*(?:of|/|от|из)\s*\d{1,4})?\W*", re.IGNORECASE)
+
+
+def is_blank(text):
+    """True for page text with nothing to analyze: empty, whitespace, punctuation or just a page number."""
+    if not text:
+        return True
+    stripped = text.strip()
+    return not stripped or (len(stripped) <= NEAR_EMPTY_CHARS and _NEAR_EMPTY.fullmatch(stripped) is not None)
+
+
+def _digest(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _lines(text):
+    """(start, end) of every line of text, without the line break."""
+    spans = []
+    start = 0
+    for end in (m.start() for m in re.finditer("\n", text)):
+        spans.append((start, end))
+        start = end + 1
+    spans.append((start, len(text)))
+    return spans
+
+
+class Deduplicator:
+    """Splits pages into the unique pieces of text that need analysis, and maps their detections back.
+
+    Exact duplicate pages share one analysis. On the remaining pages, runs of
+    lines that repeat on at least min_pages distinct pages (headers, footers,
+    disclaimers) are cut out as blocks: every distinct block is analyzed once,
+    as is the rest of each page with its blocks removed. project() shifts the
+    detections of each piece back to every page it came from, so offsets refer
+    to the original page text. Blank and near-empty pages produce no pieces.
+    """
+
+    def __init__(self, pages, min_pages=MIN_PAGES, min_block_chars=MIN_BLOCK_CHARS):
+        self.page_numbers = [page_num for page_num, _ in pages]
+        self.units = []  # unique texts to analyze
+        self._unit_index = {}  # digest -> index into units
+        self.stats = Counter(pages=len(pages), chars=sum(len(text or "") for _, text in pages))
+
+        # Lines are counted once per distinct page text, so a duplicated page doesn't turn into boilerplate
+        distinct = {}
+        for i, (_, text) in enumerate(pages):
+            if not is_blank(text):
+                distinct.setdefault(_digest(text), i)
+        line_pages = Counter()
+        for i in distinct.values():
+            text = pages[i][1]
+            line_pages.update({_digest(line) for line in (text[s:e].strip() for s, e in _lines(text)) if line})
+        repeated = {digest for digest, count in line_pages.items() if count >= min_pages}
+
+        # Per page: [(unit index, [(unit offset, page offset, length)])]
+        layouts = {}
+        self._layouts = []
+        for _, text in pages:
+            if is_blank(text):
+                self.stats["blank_pages"] += 1
+                self._layouts.append([])
+                continue
+            digest = _digest(text)
+            if digest in layouts:
+                self.stats["duplicate_pages"] += 1
+            else:
+                layouts[digest] = self._layout(text, repeated, min_block_chars)
+            self._layouts.append(layouts[digest])
+        self.stats["units"] = len(self.units)
+        self.stats["unit_chars"] = sum(len(unit) for unit in self.units)
+
+    def _unit(self, text):
+        digest = _digest(text)
+        index = self._unit_index.get(digest)
+        if index is None:
+            index = self._unit_index[digest] = len(self.units)
+            self.units.append(text)
+        return index
+
+    def _blocks(self, text, repeated, min_block_chars):
+        """(start, end) of each run of repeated lines (blank lines inside a run included) worth cutting out."""
+        blocks = []
+
+        def close(run):
+            if run and sum(not c.isspace() for c in text[run[0]:run[1]]) >= min_block_chars:
+                blocks.append(run)
+
+        run = None
+        for start, end in _lines(text):
+            line = text[start:end].strip()
+            if not line:
+                continue  # blank lines neither start nor end a run
+            if _digest(line) in repeated:
+                run = (run[0] if run else start, end)
+            else:
+                close(run)
+                run = None
+        close(run)
+        return blocks
+
+    def _layout(self, text, repeated, min_block_chars):
+        blocks = self._blocks(text, repeated, min_block_chars)
+        if not blocks:
+            return [(self._unit(text), [(0, 0, len(text))])]
+
+        layout = [(self._unit(text[start:end]), [(0, start, end - start)]) for start, end in blocks]
+        self.stats["blocks"] += len(blocks)
+        segments = []
+        rest = []
+        offset = 0
+        for start, end in zip([0] + [end for _, end in blocks], [start for start, _ in blocks] + [len(text)]):
+            if end > start:
+                segments.append((offset, start, end - start))
+                rest.append(text[start:end])
+                offset += end - start
+        rest = "".join(rest)
+        if not is_blank(rest):
+            layout.append((self._unit(rest), segments))
+        return layout
+
+    def project(self, unit_detections):
+        """Page results ({"page_number", "detections"}) from the detections of each unit, in page order."""
+        results = []
+        for page_num, layout in zip(self.page_numbers, self._layouts):
+            detections = []
+            for unit, segments in layout:
+                detections += _project(unit_detections[unit], segments, self.units[unit])
+            detections.sort(key=lambda d: (d["start"], d["end"]))
+            results.append({"page_number": page_num, "detections": detections})
+        return results
+
+    def summary(self):
+        s = self.stats
+        return (f"{s['pages']} pages: {s['duplicate_pages']} duplicate, {s['blank_pages']} blank, "
+                f"{s['blocks']} boilerplate block(s) cut out; analyzing {s['units']} unique piece(s), "
+                f"{s['unit_chars']} of {s['chars']} chars")
+
+
+def _project(detections, segments, unit_text):
+    """Move detections from a unit's coordinates to its page's.
+
+    A detection spanning two segments of a page remainder (i.e. across a cut-out
+    block) is split, so each piece still covers only text of the page.
+    """
+    if len(segments) == 1:
+        page_offset = segments[0][1]
+        return [dict(d, start=d["start"] + page_offset, end=d["end"] + page_offset) for d in detections]
+
+    starts = [unit_offset for unit_offset, _, _ in segments]
+    projected = []
+    for d in detections:
+        i = bisect_right(starts, d["start"]) - 1
+        pos = d["start"]
+        while pos < d["end"]:
+            unit_offset, page_offset, length = segments[i]
+            end = min(d["end"], unit_offset + length)
+            piece = dict(d, start=page_offset + pos - unit_offset, end=page_offset + end - unit_offset)
+            if (pos, end) != (d["start"], d["end"]):
+                piece["text"] = unit_text[pos:end]
+            projected.append(piece)
+            pos = end
+            i += 1
+    return projected
+
+
+def analyze_deduplicated(pages, analyze):
+    """Analyze (page_num, text) pairs with each unique piece of text analyzed once.
+
+    analyze takes a list of (key, text) pairs and returns their results
+    ({"detections": [...]}) in the same order, e.g. AnalyzerPool.analyze.
+    Returns one {"page_number", "detections"} result per page, in order.
+    """
+    dedup = Deduplicator(pages)
+    print(f"Deduplicated {dedup.summary()}")
+    results = analyze(list(enumerate(dedup.units))) if dedup.units else []
+    return dedup.project([result["detections"] for result in results])
@@ -0,0 +1,174 @@
+import array
+import json
+import struct
+import sys
+
+# Layout: header | JSON metadata | columns (little-endian arrays) | UTF-8 detection texts
+MAGIC = b"PIIDETS\0"
+VERSION = 1
+_HEADER = struct.Struct("<8sIIIQ")  # magic, version, page count, detection count, metadata length
+
+DETECTIONS_SUFFIX = ".dets"
+
+# (attribute, array typecode, rows): rows are per page, per page + 1, per detection or per detection + 1
+_COLUMNS = (
+    ("page_numbers", "I", "pages"),
+    ("page_offsets", "I", "pages+1"),  # page i owns detection rows page_offsets[i]:page_offsets[i + 1]
+    ("starts", "I", "rows"),
+    ("ends", "I", "rows"),
+    ("scores", "d", "rows"),
+    ("type_codes", "H", "rows"),
+    ("source_codes", "B", "rows"),
+    ("text_offsets", "I", "rows+1"),  # character offsets into the joined detection texts
+)
+
+
+def _little_endian(column):
+    if sys.byteorder == "big":
+        column = array.array(column.typecode, column)
+        column.byteswap()
+    return column
+
+
+class DetectionBatch:
+    """Detections for a run of pages, stored column by column.
+
+    One row per detection instead of one dict: start, end and score live in
+    typed arrays, type and source are small integer codes into `types` and
+    `sources`, and the detection texts are one joined string. Pages are kept
+    in order, including pages without detections. to_results() gives back the
+    usual {"page_number", "detections"} dicts.
+    """
+
+    def __init__(self):
+        for name, typecode, rows in _COLUMNS:
+            setattr(self, name, array.array(typecode, [0] if rows.endswith("+1") else []))
+        self.types = []
+        self.sources = []
+        self._type_index = {}
+        self._source_index = {}
+        self._text_parts = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def page_count(self):
+        return len(self.page_numbers)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the columns and texts (the per-object overhead of the dicts is gone)."""
+        return (sum(getattr(self, name).buffer_info()[1] * getattr(self, name).itemsize for name, _, _ in _COLUMNS)
+                + sys.getsizeof(self._texts()))
+
+    @staticmethod
+    def _code(names, index, value):
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(names)
+            names.append(value)
+        return code
+
+    def add_page(self, page_number, detections):
+        """Append one page's detection dicts."""
+        self.page_numbers.append(page_number)
+        for d in detections:
+            text = d.get("text", "")
+            self.starts.append(d["start"])
+            self.ends.append(d["end"])
+            self.scores.append(d["score"])
+            self.type_codes.append(self._code(self.types, self._type_index, d["type"]))
+            self.source_codes.append(self._code(self.sources, self._source_index, d.get("source")))
+            self.text_offsets.append(self.text_offsets[-1] + len(text))
+            self._text_parts.append(text)
+        self.page_offsets.append(len(self.starts))
+
+    @classmethod
+    def from_results(cls, results):
+        batch = cls()
+        for result in results:
+            batch.add_page(result["page_number"], result["detections"])
+        return batch
+
+    def _texts(self):
+        # Joined on first read, so appending stays linear
+        if len(self._text_parts) != 1:
+            self._text_parts = ["".join(self._text_parts)]
+        return self._text_parts[0]
+
+    def row(self, i):
+        """Detection row i as a dict, in the shape text_analyzer produces."""
+        detection = {"type": self.types[self.type_codes[i]],
+                     "text": self._texts()[self.text_offsets[i]:self.text_offsets[i + 1]],
+                     "start": self.starts[i], "end": self.ends[i], "score": self.scores[i]}
+        source = self.sources[self.source_codes[i]]
+        if source is not None:
+            detection["source"] = source
+        return detection
+
+    def page_detections(self, index):
+        """Detection dicts of the page at position `index`."""
+        return [self.row(i) for i in range(self.page_offsets[index], self.page_offsets[index + 1])]
+
+    def to_results(self):
+        return [{"page_number": page_number, "detections": self.page_detections(index)}
+                for index, page_number in enumerate(self.page_numbers)]
+
+    def write(self, path, metadata=None):
+        """Write the batch to a .dets file; metadata is any JSON-serializable extra (e.g. the step1 header)."""
+        meta = json.dumps({"types": self.types, "sources": self.sources, "metadata": metadata},
+                          ensure_ascii=False).encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, self.page_count, len(self), len(meta)))
+            f.write(meta)
+            for name, _, _ in _COLUMNS:
+                _little_endian(getattr(self, name)).tofile(f)
+            f.write(self._texts().encode("utf-8"))
+
+    @classmethod
+    def read(cls, path):
+        """Read a .dets file. Returns (batch, metadata)."""
+        with open(path, "rb") as f:
+            magic, version, pages, rows, meta_length = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} detections file")
+            meta = json.loads(f.read(meta_length))
+            batch = cls()
+            batch.types, batch.sources = meta["types"], meta["sources"]
+            counts = {"pages": pages, "pages+1": pages + 1, "rows": rows, "rows+1": rows + 1}
+            for name, typecode, count in _COLUMNS:
+                column = array.array(typecode)
+                column.fromfile(f, counts[count])
+                setattr(batch, name, _little_endian(column))
+            batch._text_parts = [f.read().decode("utf-8")]
+        batch._type_index = {value: code for code, value in enumerate(batch.types)}
+        batch._source_index = {value: code for code, value in enumerate(batch.sources)}
+        return batch, meta["metadata"]
+
+
+def write_detections(path, data, results):
+    """Save step2 output (step1 data with each page's text replaced by its detections) as a .dets file."""
+    pages = data["pages"] if isinstance(data, dict) else data
+    metadata = {
+        "header": {k: v for k, v in data.items() if k != "pages"} if isinstance(data, dict) else None,
+        "pages": [{k: v for k, v in page.items() if k not in ("page_number", "text", "content", "detections")}
+                  for page in pages],
+    }
+    batch = DetectionBatch.from_results(results)
+    batch.write(path, metadata)
+    return batch
+
+
+def read_detections(path):
+    """Read a .dets file back into the step2 JSON shape that save_detections writes."""
+    batch, metadata = DetectionBatch.read(path)
+    pages = []
+    for index, page_number in enumerate(batch.page_numbers):
+        page = {"page_number": page_number}
+        page.update(metadata["pages"][index])
+        page["detections"] = batch.page_detections(index)
+        pages.append(page)
+    if metadata["header"] is None:
+        return pages
+    return dict(metadata["header"], pages=pages)
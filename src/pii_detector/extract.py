@@ -0,0 +1,92 @@
+import collections
+import json
+import multiprocessing
+
+TASKS_PER_WORKER = 4  # page ranges per worker, so a slow range doesn't hold up the others for long
+
+
+def page_count(pdf_path):
+    import fitz
+    with fitz.open(pdf_path) as doc:
+        return len(doc)
+
+
+def iter_page_texts(pdf_path, start=0, stop=None, boxes=False):
+    """Yield (page_index, text) for pages [start, stop) of the PDF, one page at a time.
+
+    With boxes=True yield (page_index, text, PageBoxes) instead, from the same extraction.
+    """
+    import fitz  # imported here so write_jsonl users don't need PyMuPDF
+    if boxes:
+        from pii_detector.boxes import PageBoxes
+    with fitz.open(pdf_path) as doc:
+        stop = len(doc) if stop is None else min(stop, len(doc))
+        for page_num in range(start, stop):
+            page = doc.load_page(page_num)
+            if boxes:
+                yield (page_num, *PageBoxes.from_page(page))
+            else:
+                yield page_num, page.get_text()
+
+
+def _extract_range(task):
+    # Runs in a worker process, which opens the document itself
+    pdf_path, start, stop, boxes = task
+    return list(iter_page_texts(pdf_path, start, stop, boxes))
+
+
+def extract_document(pdf_path):
+    """All page texts of one PDF, or the error message if it can't be read. For pool workers."""
+    try:
+        return pdf_path, [text for _, text in iter_page_texts(pdf_path)], None
+    except Exception as e:
+        return pdf_path, [], f"{type(e).__name__}: {e}"
+
+
+def page_ranges(total, workers, pages_per_task=None):
+    """Split [0, total) into consecutive (start, stop) ranges."""
+    if pages_per_task is None:
+        pages_per_task = max(1, -(-total // (workers * TASKS_PER_WORKER)))
+    return [(start, min(start + pages_per_task, total)) for start in range(0, total, pages_per_task)]
+
+
+def extract_pages(pdf_path, workers=1, pages_per_task=None, boxes=False):
+    """Yield (page_index, text) for every page, in page order; (page_index, text, PageBoxes) with boxes=True.
+
+    With workers > 1 the document is split into page ranges that separate
+    processes extract in parallel; ranges are still yielded in order, each as
+    soon as it and everything before it is done. At most 2 * workers ranges are
+    extracted ahead of the consumer.
+    """
+    if workers <= 1:
+        yield from iter_page_texts(pdf_path, boxes=boxes)
+        return
+
+    ranges = page_ranges(page_count(pdf_path), workers, pages_per_task)
+    if len(ranges) <= 1:
+        yield from iter_page_texts(pdf_path, boxes=boxes)
+        return
+
+    tasks = [(str(pdf_path), start, stop, boxes) for start, stop in ranges]
+    with multiprocessing.get_context("spawn").Pool(min(workers, len(tasks))) as pool:
+        # Only a few ranges are submitted ahead, so a slow consumer holds extraction back
+        pending = collections.deque()
+        for task in tasks:
+            pending.append(pool.apply_async(_extract_range, (task,)))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+
+def write_jsonl(records, output_file, header=None):
+    """Write one JSON line per record as it is produced. Returns the number of records."""
+    count = 0
+    with open(output_file, "w", encoding="utf-8") as f:
+        if header is not None:
+            f.write(json.dumps(header, ensure_ascii=False) + "\n")
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()  # lets a downstream step tail the file while extraction runs
+            count += 1
+    return count
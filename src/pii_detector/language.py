@@ -0,0 +1,63 @@
+import re
+from functools import lru_cache
+
+from pii_detector.models import SPACY_MODELS
+
+SCRIPT_SHARE = 0.8  # share of letters in one script that settles the language without langdetect
+MIN_LETTERS = 20
+RUSSIAN_SHARE = 0.005  # ы, э and ё are ~2% of Russian letters and absent from Bulgarian
+
+_CYRILLIC = re.compile(r"[Ѐ-ӿ]")
+_LATIN = re.compile(r"[A-Za-zÀ-ɏ]")
+_RUSSIAN_ONLY = re.compile(r"[ыэёЫЭЁ]")
+
+
+def script_language(text):
+    """Language from the Unicode script alone, or None if the text is too short or mixes scripts."""
+    cyrillic = len(_CYRILLIC.findall(text))
+    latin = len(_LATIN.findall(text))
+    letters = cyrillic + latin
+    if letters < MIN_LETTERS:
+        return None
+    if cyrillic >= SCRIPT_SHARE * letters:
+        return "ru" if len(_RUSSIAN_ONLY.findall(text)) >= max(2, RUSSIAN_SHARE * cyrillic) else "bg"
+    if latin >= SCRIPT_SHARE * letters:
+        return "en"
+    return None
+
+
+def statistical_language(text):
+    """langdetect's guess, seeded so it is the same on every run; None if it can't tell."""
+    from langdetect import DetectorFactory, LangDetectException, detect
+    DetectorFactory.seed = 0
+    try:
+        return detect(text)
+    except LangDetectException:
+        return None
+
+
+@lru_cache(maxsize=8192)
+def page_language(text, default="en"):
+    """Language of one page or paragraph, limited to the languages we have models for.
+
+    The script check settles almost every page; langdetect only sees short or
+    mixed-script text. Returns None for text without any content.
+    """
+    text = text.strip()
+    if not text:
+        return None
+    language = script_language(text) or statistical_language(text)
+    return language if language in SPACY_MODELS else default
+
+
+def group_by_language(texts, default="en"):
+    """{language: [indices]} for a list of page texts, with empty pages under None.
+
+    English comes after the other languages, so an analyzer loaded for them
+    (which always includes English) is reused for the English pages.
+    """
+    groups = {}
+    for i, text in enumerate(texts):
+        groups.setdefault(page_language(text or "", default), []).append(i)
+    order = sorted(groups, key=lambda language: (language is None, language == "en"))
+    return {language: groups[language] for language in order}
@@ -0,0 +1,20 @@
+import hashlib
+
+from pii_detector.cache import DetectionCache
+
+DEFAULT_LLM_CACHE_PATH = "output/cache/llm.sqlite"
+DEFAULT_LLM_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+def prompt_hash(system_prompt):
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+
+
+def open_llm_cache(path, model, system_prompt, max_bytes=DEFAULT_LLM_CACHE_MAX_BYTES):
+    """Cache of parsed LLM answers per page, keyed by model + system prompt hash + the page text.
+
+    Changing the model or editing prompts/system-prompt.txt switches to a fresh
+    namespace, so old answers are never returned; prune_stale() drops them.
+    """
+    return DetectionCache(path, {"model": model, "system_prompt_sha256": prompt_hash(system_prompt), "key": "page"},
+                          max_bytes)
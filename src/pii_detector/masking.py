@@ -0,0 +1,180 @@
+import collections
+import multiprocessing
+import os
+import tempfile
+
+from pii_detector.boxes import BoxIndex, PageBoxes
+from pii_detector.extract import page_count, page_ranges
+from pii_detector.propagation import normalize
+from pii_detector.spans import resolve
+
+FILL = (0, 0, 0)  # redaction box colour
+
+
+class Placeholders:
+    """Placeholders like <PERSON_1> that are consistent within one document.
+
+    The same value of the same type (case and whitespace ignored) always gets
+    the same number, so masked text still shows who is who.
+    """
+
+    def __init__(self):
+        self._numbers = {}
+        self._counts = collections.Counter()
+        self.values = {}  # placeholder -> first value seen, for an optional mapping file
+
+    def __call__(self, pii_type, value):
+        pii_type = (pii_type or "PII").upper()
+        key = (pii_type, normalize(value))
+        placeholder = self._numbers.get(key)
+        if placeholder is None:
+            self._counts[pii_type] += 1
+            placeholder = self._numbers[key] = f"<{pii_type}_{self._counts[pii_type]}>"
+            self.values[placeholder] = value
+        return placeholder
+
+
+def mask_text(text, detections, placeholders):
+    """text with every detected span replaced by its placeholder; overlaps are resolved first."""
+    parts = []
+    pos = 0
+    for d in resolve(detections):
+        parts.append(text[pos:d["start"]])
+        parts.append(placeholders(d["type"], text[d["start"]:d["end"]]))
+        pos = d["end"]
+    parts.append(text[pos:])
+    return "".join(parts)
+
+
+def _redact_areas(page, rects, fill):
+    """Redact all rects of a page with one Redact annotation and one apply_redactions call.
+
+    The areas go into the annotation's QuadPoints, which MuPDF redacts one by
+    one: adding an annotation per area costs time proportional to the number
+    already on the page, and applying them all costs about as much again. The
+    annotation itself doesn't fill (that would black out the union of the
+    areas), so the boxes are drawn afterwards as one shape.
+    """
+    import fitz
+    rects = [fitz.Rect(rect) for rect in rects]
+    union = fitz.Rect(rects[0])
+    for rect in rects[1:]:
+        union |= rect
+    annot = page.add_redact_annot(union, fill=False)
+    to_pdf = ~page.transformation_matrix
+    points = []
+    for rect in rects:
+        quad = rect.quad * to_pdf
+        points += [quad.ul.x, quad.ul.y, quad.ur.x, quad.ur.y, quad.ll.x, quad.ll.y, quad.lr.x, quad.lr.y]
+    page.parent.xref_set_key(annot.xref, "QuadPoints", "[" + " ".join(f"{v:g}" for v in points) + "]")
+    page.apply_redactions()
+
+    if fill is not None:
+        shape = page.new_shape()
+        for rect in rects:
+            shape.draw_rect(rect)
+        shape.finish(color=None, fill=fill, width=0)
+        shape.commit()
+
+
+def redact_page(page, detections, fill=FILL, page_boxes=None):
+    """Cover every detection on a PyMuPDF page with a redaction, applied once for the whole page.
+
+    Detection offsets refer to page.get_text(), as written by step1. Their
+    rectangles come from page_boxes (the step1 box index) or, without one,
+    from a fresh extraction of the page; a detection whose text doesn't match
+    at its offsets, or that has no boxes, falls back to searching the page
+    for its text. Returns (redacted areas, fallbacks).
+    """
+    if not detections:
+        return 0, 0
+    text = None
+    if page_boxes is None:
+        text, page_boxes = PageBoxes.from_page(page)
+
+    rects = []
+    fallbacks = 0
+    for d in detections:
+        value = d.get("text")
+        found = []
+        if text is None or value is None or text[d["start"]:d["end"]] == value:
+            found = page_boxes.rects(d["start"], d["end"])
+        if not found and value and value.strip():
+            found = page.search_for(value)
+            fallbacks += 1
+        rects += found
+    if rects:
+        _redact_areas(page, rects, fill)
+    return len(rects), fallbacks
+
+
+def _redact_pages(doc, start, stop, detections, boxes_file=None):
+    box_index = BoxIndex.load(boxes_file, set(range(start + 1, stop + 1))) if boxes_file else None
+    redactions = fallbacks = 0
+    for page_index in range(start, stop):
+        page_boxes = box_index.page(page_index + 1) if box_index is not None else None
+        page_redactions, page_fallbacks = redact_page(doc.load_page(page_index), detections.get(page_index + 1),
+                                                      page_boxes=page_boxes)
+        redactions += page_redactions
+        fallbacks += page_fallbacks
+    return redactions, fallbacks
+
+
+def _redact_range(task):
+    # Runs in a worker process, which opens the document itself and saves only its own pages
+    pdf_path, start, stop, detections, boxes_file, part_path = task
+    import fitz
+    with fitz.open(pdf_path) as doc:
+        redactions, fallbacks = _redact_pages(doc, start, stop, detections, boxes_file)
+        doc.select(list(range(start, stop)))
+        doc.save(part_path, garbage=3, deflate=True)
+    return part_path, redactions, fallbacks
+
+
+def redact_pdf(pdf_path, detections, output_path, workers=1, pages_per_task=None, boxes_file=None):
+    """Write a redacted copy of the PDF. detections is {page_number (1-based): [detection dicts]}.
+
+    boxes_file is the step1 box index (see boxes.py); without it each page
+    with detections is extracted again to find the character boxes. With
+    workers > 1 page ranges are redacted by separate processes and the parts
+    are stitched back together in page order as they finish; at most
+    2 * workers ranges are in flight. Metadata and the outline are copied to
+    the stitched document. Returns {"pages", "redactions", "fallbacks"}.
+    """
+    import fitz
+    total = page_count(pdf_path)
+    ranges = page_ranges(total, workers, pages_per_task) if workers > 1 else [(0, total)]
+    if len(ranges) <= 1:
+        with fitz.open(pdf_path) as doc:
+            redactions, fallbacks = _redact_pages(doc, 0, total, detections, boxes_file)
+            doc.save(output_path, garbage=3, deflate=True)
+        return {"pages": total, "redactions": redactions, "fallbacks": fallbacks}
+
+    stats = {"pages": total, "redactions": 0, "fallbacks": 0}
+    with tempfile.TemporaryDirectory(prefix="redact_") as tmp, fitz.open() as out, fitz.open(pdf_path) as original:
+        tasks = [(str(pdf_path), start, stop, {n: detections[n] for n in range(start + 1, stop + 1) if n in detections},
+                  boxes_file and str(boxes_file), os.path.join(tmp, f"part_{start:06d}.pdf"))
+                 for start, stop in ranges]
+
+        def stitch(part_path, redactions, fallbacks):
+            with fitz.open(part_path) as part:
+                out.insert_pdf(part)
+            os.remove(part_path)
+            stats["redactions"] += redactions
+            stats["fallbacks"] += fallbacks
+
+        with multiprocessing.get_context("spawn").Pool(min(workers, len(tasks))) as pool:
+            pending = collections.deque()
+            for task in tasks:
+                pending.append(pool.apply_async(_redact_range, (task,)))
+                if len(pending) >= 2 * workers:
+                    stitch(*pending.popleft().get())
+            while pending:
+                stitch(*pending.popleft().get())
+
+        out.set_metadata(original.metadata)
+        toc = original.get_toc(simple=False)
+        if toc:
+            out.set_toc(toc)
+        out.save(output_path, garbage=3, deflate=True)
+    return stats
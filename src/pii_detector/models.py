@@ -0,0 +1,73 @@
+import threading
+
+# spaCy model per language for the Presidio analyzers; English is always loaded alongside
+SPACY_MODELS = {
+    "en": "en_core_web_lg",
+    "bg": "bg_news_trf",
+    "ru": "ru_core_news_lg",
+}
+
+_lock = threading.RLock()
+_loaded = {}
+
+
+def _get(key, build):
+    """Build an object on first use and return the same one afterwards (thread-safe)."""
+    with _lock:
+        if key not in _loaded:
+            _loaded[key] = build()
+        return _loaded[key]
+
+
+def loaded():
+    """Keys of everything loaded so far in this process."""
+    return list(_loaded)
+
+
+def spacy_model(name):
+    """A spaCy pipeline by package name."""
+    def build():
+        import spacy
+        return spacy.load(name)
+    return _get(("spacy", name), build)
+
+
+def default_analyzer():
+    """Presidio's default AnalyzerEngine (English, en_core_web_lg)."""
+    def build():
+        from presidio_analyzer import AnalyzerEngine
+        return AnalyzerEngine()
+    return _get(("analyzer", "default"), build)
+
+
+def analyzer_for(language, models=SPACY_MODELS):
+    """AnalyzerEngine for English plus `language`, using the spaCy models in `models`."""
+    if language not in models:
+        raise ValueError(f"Unsupported language: {language}")
+
+    models_key = tuple(sorted(models.items()))
+    with _lock:
+        # Every analyzer includes English, so English pages can reuse one loaded for another language
+        for key, analyzer in _loaded.items():
+            if key[0] == "analyzer" and key[-1] == models_key and language in analyzer.supported_languages:
+                return analyzer
+
+    def build():
+        from presidio_analyzer import AnalyzerEngine
+        from presidio_analyzer.nlp_engine import NlpEngineProvider
+
+        languages = ["en"] if language == "en" else ["en", language]
+        provider = NlpEngineProvider(nlp_configuration={
+            "nlp_engine_name": "spacy",
+            "models": [{"lang_code": lang, "model_name": models[lang]} for lang in languages],
+        })
+        return AnalyzerEngine(nlp_engine=provider.create_engine(), supported_languages=languages)
+    return _get(("analyzer", language, models_key), build)
+
+
+def batch_analyzer(analyzer):
+    """BatchAnalyzerEngine wrapping an analyzer from this registry."""
+    def build():
+        from presidio_analyzer import BatchAnalyzerEngine
+        return BatchAnalyzerEngine(analyzer_engine=analyzer)
+    return _get(("batch", id(analyzer)), build)
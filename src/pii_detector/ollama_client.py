@@ -0,0 +1,226 @@
+import asyncio
+import collections
+import json
+import random
+from urllib.parse import urlsplit
+
+OLLAMA_URL = "http://localhost:11434"
+DEFAULT_MODEL = "qwen3:14b-no-think"
+
+
+class OllamaError(Exception):
+    pass
+
+
+class _RetryableError(OllamaError):
+    pass
+
+
+class _Connection:
+    """One keep-alive HTTP/1.1 connection."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.reusable = True
+
+    def close(self):
+        self.writer.close()
+
+
+class AsyncOllamaClient:
+    """asyncio client for Ollama's /api/chat with a keep-alive connection pool.
+
+    At most `concurrency` requests are in flight; set it to the server's
+    OLLAMA_NUM_PARALLEL. Failed requests (connection errors, timeouts, 5xx) are
+    retried with exponential backoff; once the retries run out chat() returns
+    None, like for an error answer, so one bad page doesn't stop a document.
+    The timeout grows with the prompt length.
+    """
+
+    def __init__(self, base_url=OLLAMA_URL, model=DEFAULT_MODEL, concurrency=4, retries=3, backoff=1.0,
+                 base_timeout=30.0, timeout_per_1k_chars=10.0, stream=False):
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.model = model
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.base_timeout = base_timeout
+        self.timeout_per_1k_chars = timeout_per_1k_chars
+        self.stream = stream
+        self._idle = []
+        self._slots = asyncio.Semaphore(concurrency)
+
+    def timeout_for(self, prompt_chars):
+        return self.base_timeout + self.timeout_per_1k_chars * prompt_chars / 1000
+
+    async def chat(self, system_prompt, user_prompt, on_token=None):
+        """Send one chat request and return the assistant message content.
+
+        With stream=True the reply is read as it is generated and on_token(text)
+        is called for every piece. Returns None if Ollama answers with an error
+        or the request still fails after all retries.
+        """
+        payload = {
+            "model": self.model,
+            "stream": self.stream,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ]
+        }
+        timeout = self.timeout_for(len(system_prompt) + len(user_prompt))
+
+        async with self._slots:
+            for attempt in range(self.retries + 1):
+                try:
+                    return await asyncio.wait_for(self._post_chat(payload, on_token), timeout)
+                except (_RetryableError, OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                    if attempt == self.retries:
+                        print(f"  Ollama request failed after {attempt + 1} attempts ({e!r}), giving up")
+                        return None
+                    delay = self.backoff * 2 ** attempt * (1 + random.random() / 2)
+                    print(f"  Ollama request failed ({e!r}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+
+    async def _post_chat(self, payload, on_token):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        conn = await self._acquire()
+        try:
+            conn.writer.write(
+                f"POST /api/chat HTTP/1.1\r\n"
+                f"Host: {self.host}:{self.port}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: keep-alive\r\n\r\n".encode("ascii") + body)
+            await conn.writer.drain()
+
+            status, headers = await self._read_head(conn)
+            if status >= 500:
+                await self._read_body(conn, headers)
+                raise _RetryableError(f"HTTP {status}")
+
+            if payload["stream"] and status == 200:
+                content = await self._read_stream(conn, headers, on_token)
+            else:
+                body = await self._read_body(conn, headers)
+                try:
+                    result = json.loads(body or b"{}")
+                except ValueError:
+                    # Not Ollama: a plain-text "404 page not found" for a wrong URL, a proxy's error page
+                    result = {"status": status, "body": body[:200].decode("utf-8", "replace")}
+                if not isinstance(result, dict) or "message" not in result:
+                    print(f"  Ollama error: {result}")
+                    content = None
+                else:
+                    content = result["message"]["content"]
+        except BaseException:
+            conn.close()
+            raise
+        self._release(conn)
+        return content
+
+    async def _acquire(self):
+        while self._idle:
+            conn = self._idle.pop()
+            if not conn.reader.at_eof():
+                return conn
+            conn.close()
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        return _Connection(reader, writer)
+
+    def _release(self, conn):
+        if conn.reusable and len(self._idle) < self.concurrency:
+            self._idle.append(conn)
+        else:
+            conn.close()
+
+    async def _read_head(self, conn):
+        status_line = await conn.reader.readline()
+        if not status_line:
+            raise _RetryableError("connection closed by server")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await conn.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if headers.get("connection", "").lower() == "close":
+            conn.reusable = False
+        return status, headers
+
+    async def _iter_body(self, conn, headers):
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size = int((await conn.reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await conn.reader.readline()
+                    return
+                yield await conn.reader.readexactly(size)
+                await conn.reader.readexactly(2)
+        elif "content-length" in headers:
+            yield await conn.reader.readexactly(int(headers["content-length"]))
+        else:
+            conn.reusable = False
+            yield await conn.reader.read()
+
+    async def _read_body(self, conn, headers):
+        return b"".join([piece async for piece in self._iter_body(conn, headers)])
+
+    async def _read_stream(self, conn, headers, on_token):
+        """Read an NDJSON stream of partial messages and return the joined content, or None on an error line.
+
+        The body is always read to the end, so the connection can be reused.
+        """
+        parts = []
+        error = False
+        buffer = b""
+        async for piece in self._iter_body(conn, headers):
+            buffer += piece
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    message = {"error": line[:200].decode("utf-8", "replace")}
+                if "error" in message:
+                    print(f"  Ollama error: {message}")
+                    error = True
+                if error:
+                    continue
+                token = message.get("message", {}).get("content", "")
+                parts.append(token)
+                if on_token and token:
+                    on_token(token)
+        return None if error else "".join(parts)
+
+    async def close(self):
+        while self._idle:
+            self._idle.pop().close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+async def map_ordered(fn, items, window):
+    """Run the coroutine fn over items with at most `window` tasks in flight; yield results in input order.
+
+    A finished result is only yielded once everything before it is done, so the
+    caller can write output in order. Bounding the window gives backpressure.
+    """
+    pending = collections.deque()
+    for item in items:
+        pending.append(asyncio.ensure_future(fn(item)))
+        if len(pending) >= window:
+            yield await pending.popleft()
+    while pending:
+        yield await pending.popleft()
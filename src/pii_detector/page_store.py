@@ -0,0 +1,125 @@
+import json
+import mmap
+import struct
+
+# Layout: header | UTF-8 page texts | offset table | JSON metadata
+MAGIC = b"PIIPAGES"
+VERSION = 1
+_HEADER = struct.Struct("<8sIIQQQ")  # magic, version, page count, table offset, metadata offset, metadata length
+_ENTRY = struct.Struct("<IQQ")  # page number, text offset, text length in bytes
+
+STORE_SUFFIX = ".pages"
+
+
+def write_page_store(path, pages, header=None, text_key="text"):
+    """Write (page_number, text, metadata) triples to a page store, one page at a time.
+
+    header is the document-level dict of the step1 JSON (None for the list
+    shape); metadata is an optional dict of other per-page fields. Returns the
+    number of pages written.
+    """
+    entries = []
+    page_meta = []
+    with open(path, "wb") as f:
+        f.write(b"\0" * _HEADER.size)
+        offset = _HEADER.size
+        for page_number, text, meta in pages:
+            data = (text or "").encode("utf-8")
+            f.write(data)
+            entries.append((page_number, offset, len(data)))
+            page_meta.append(meta or {})
+            offset += len(data)
+
+        table_offset = offset
+        for entry in entries:
+            f.write(_ENTRY.pack(*entry))
+
+        meta_offset = table_offset + len(entries) * _ENTRY.size
+        metadata = json.dumps({"header": header, "text_key": text_key, "pages": page_meta},
+                              ensure_ascii=False).encode("utf-8")
+        f.write(metadata)
+
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, VERSION, len(entries), table_offset, meta_offset, len(metadata)))
+    return len(entries)
+
+
+class PageStore:
+    """Read-only, memory-mapped page store with random access by page index.
+
+    Opening reads only the header and offset table; page text is decoded from
+    the mapping on access, so many processes can open the same file and share
+    it through the OS page cache.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._file = open(self.path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, table_offset, self._meta_offset, self._meta_length = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{self.path} is not a version {VERSION} page store")
+        entries = list(_ENTRY.iter_unpack(self._mm[table_offset:table_offset + count * _ENTRY.size]))
+        self.page_numbers = [entry[0] for entry in entries]
+        self._offsets = [entry[1] for entry in entries]
+        self.byte_lengths = [entry[2] for entry in entries]
+        self._metadata = None
+
+    def __len__(self):
+        return len(self.page_numbers)
+
+    def raw(self, index):
+        """The page's UTF-8 bytes as a zero-copy memoryview into the mapping."""
+        start = self._offsets[index]
+        return memoryview(self._mm)[start:start + self.byte_lengths[index]]
+
+    def text(self, index):
+        return str(self.raw(index), "utf-8")
+
+    def __getitem__(self, index):
+        return self.page_numbers[index], self.text(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    @property
+    def metadata(self):
+        if self._metadata is None:
+            self._metadata = json.loads(self._mm[self._meta_offset:self._meta_offset + self._meta_length])
+        return self._metadata
+
+    def to_step1(self, include_text=True):
+        """The step1 JSON shape this store was made from; without text if include_text is False."""
+        metadata = self.metadata
+        pages = []
+        for index, page_number in enumerate(self.page_numbers):
+            page = {"page_number": page_number}
+            if include_text:
+                page[metadata["text_key"]] = self.text(index)
+            page.update(metadata["pages"][index])
+            pages.append(page)
+        if metadata["header"] is None:
+            return pages
+        return dict(metadata["header"], pages=pages)
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def step1_to_store(data, path):
+    """Write parsed step1 output (either shape) to a page store."""
+    pages = data["pages"] if isinstance(data, dict) else data
+    header = {k: v for k, v in data.items() if k != "pages"} if isinstance(data, dict) else None
+    text_key = "text" if not pages or "text" in pages[0] else "content"
+    return write_page_store(path, ((p["page_number"], p.get(text_key, ""),
+                                    {k: v for k, v in p.items() if k not in ("page_number", text_key)})
+                                   for p in pages), header, text_key)
@@ -0,0 +1,164 @@
+import json
+from pathlib import Path
+
+from pii_detector.detections import DETECTIONS_SUFFIX, read_detections, write_detections
+from pii_detector.page_store import STORE_SUFFIX, PageStore
+from pii_detector.spans import RULES as SPAN_RULES, resolve
+
+
+def _is_jsonl(path):
+    return str(path).endswith(".jsonl")
+
+
+def iter_step1(path):
+    """Stream page records from a step1 file; .jsonl files are read one line at a time."""
+    if not _is_jsonl(path):
+        data = read_step1(path)
+        yield from data["pages"] if isinstance(data, dict) else data
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                if "page_number" in record:
+                    yield record
+
+
+def read_step1(path):
+    """Read a step1 output file, in either the step1_extract or the step1_extract_text shape.
+
+    A .jsonl file has one page per line; if its first line is a header (no
+    page_number) the result is the step1_extract dict, otherwise a page list.
+    A .pages store is read back into the shape it was converted from.
+    """
+    if str(path).endswith(STORE_SUFFIX):
+        with PageStore(path) as store:
+            return store.to_step1()
+    if not _is_jsonl(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    header, pages = None, []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "page_number" in record:
+                pages.append(record)
+            elif header is None:
+                header = record
+    if header is None:
+        return pages
+    return dict(header, pages=pages)
+
+
+def page_texts(data):
+    """(page_number, text) pairs from parsed step1 output."""
+    pages = data["pages"] if isinstance(data, dict) else data
+    return [(p["page_number"], p["text"] if "text" in p else p["content"]) for p in pages]
+
+
+def save_detections(data, results, stem, output_dir, binary=False) -> Path:
+    """Replace each page's text in step1 data with its detections and save it as <stem>_detections.json.
+
+    With binary=True the same data goes to a columnar <stem>_detections.dets
+    file instead (see detections.py), which is much smaller and faster to
+    write and read for documents with many detections.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if binary:
+        output_file = output_dir / f"{stem}_detections{DETECTIONS_SUFFIX}"
+        write_detections(output_file, data, results)
+        return output_file
+
+    pages = data["pages"] if isinstance(data, dict) else data
+    for page, result in zip(pages, results):
+        page["detections"] = result["detections"]
+        page.pop("text", None)
+        page.pop("content", None)
+
+    output_file = output_dir / f"{stem}_detections.json"
+
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+    return output_file
+
+
+def pii_data_cache_config(**analyzer_settings):
+    """Detection cache config for pii_data rows: the analyzer settings plus what shapes the rows."""
+    return dict(analyzer_settings, output="pii_data", span_rules=SPAN_RULES)
+
+
+# step2_parallel and step2_analyze_text: Presidio's default engine, English
+PRESIDIO_DEFAULT_CACHE_CONFIG = pii_data_cache_config(analyzer="presidio-default", language="en", score_threshold=None)
+
+
+def to_detections(results):
+    """Convert Presidio results into detection dicts."""
+    return [{"type": res.entity_type, "start": res.start, "end": res.end, "score": res.score} for res in results]
+
+
+def to_pii_data(text, detections):
+    """Convert detections for one text into pii_data rows (the step2_parallel output), overlaps resolved."""
+    return [{"text_row_number": d["start"], "column_number": d["end"], "pii_type": d["type"],
+             "value": text[d["start"]:d["end"]]} for d in resolve(detections)]
+
+
+def _iter_json_values(path):
+    """Every top-level JSON value in a file: one JSON document, JSONL, or indented objects back to back (step2_v2)."""
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    decoder = json.JSONDecoder()
+    pos = 0
+    while True:
+        while pos < len(content) and content[pos].isspace():
+            pos += 1
+        if pos == len(content):
+            return
+        value, pos = decoder.raw_decode(content, pos)
+        yield value
+
+
+def _page_detections(record):
+    """Detection dicts with offsets from any step2 page record, or None if it has no offsets."""
+    if "detections" in record:
+        return record["detections"]
+    if "spans" in record:
+        return record["spans"]
+    if "pii" in record:  # to_pii_data rows (step2_parallel / step2_multilingual)
+        return [{"type": row["pii_type"], "text": row["value"], "start": row["text_row_number"],
+                 "end": row["column_number"]} for row in record["pii"]]
+    return None
+
+
+def read_step2(path):
+    """Read detections from any step2 output into {page_number: [detection dicts]}.
+
+    Handles the step2_analyze JSON and .dets files, pipeline, step2_parallel
+    and step2_multilingual JSONL, and step2_v2 output (its "spans"). Pages
+    without offsets are left out. Raises ValueError if the file has records but
+    none of them is a page with detections (e.g. step2_analyze_text rows), so a
+    masking step never runs on nothing.
+    """
+    values = [read_detections(path)] if str(path).endswith(DETECTIONS_SUFFIX) else _iter_json_values(path)
+    records = []
+    for value in values:
+        if isinstance(value, list):
+            records.extend(value)
+        elif "pages" in value:
+            records.extend(value["pages"])
+        else:
+            records.append(value)  # one page per value; a header line has no page_number
+
+    detections = {}
+    for record in records:
+        page_detections = _page_detections(record) if "page_number" in record else None
+        if page_detections is not None:
+            detections[record["page_number"]] = page_detections
+    if records and not detections:
+        raise ValueError(f"{path} has no per-page detections; supported step2 formats are step2_analyze JSON "
+                         f"or .dets, pipeline, step2_parallel or step2_multilingual JSONL, and step2_v2 output")
+    return detections
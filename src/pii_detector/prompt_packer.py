@@ -0,0 +1,104 @@
+import re
+
+from pii_detector.chunking import split_text
+
+DEFAULT_NUM_CTX = 8192
+RESPONSE_RESERVE_TOKENS = 2048  # room left in the context for the JSON answer
+OVERLAP_CHARS = 300
+
+PAGE_MARKER = "=== PAGE {} ==="
+
+PACKED_INSTRUCTIONS = (
+    'The text contains several pages, each starting with a line "=== PAGE <n> ===". '
+    'Scan the text for any PII. Add "page": <n> to every item, where <n> is the page the value was found on.'
+)
+
+
+def read_num_ctx(modelfile="MODELFILE", default=DEFAULT_NUM_CTX):
+    """num_ctx from the Ollama Modelfile, or the default if it is not set."""
+    try:
+        with open(modelfile, "r", encoding="utf-8") as f:
+            match = re.search(r"^PARAMETER\s+num_ctx\s+(\d+)", f.read(), re.MULTILINE)
+    except OSError:
+        return default
+    return int(match.group(1)) if match else default
+
+
+def estimate_tokens(text):
+    """Rough token count: ~4 chars per token for Latin text, ~2 for Cyrillic."""
+    cyrillic = sum(1 for c in text if "Ѐ" <= c <= "ӿ")
+    return (len(text) - cyrillic) // 4 + cyrillic // 2 + 1
+
+
+def page_budget(system_prompt, num_ctx=DEFAULT_NUM_CTX):
+    """Tokens left for page text once the system prompt, instructions and answer are accounted for."""
+    overhead = estimate_tokens(system_prompt) + estimate_tokens(PACKED_INSTRUCTIONS) + 32
+    return max(256, num_ctx - overhead - RESPONSE_RESERVE_TOKENS)
+
+
+def _segments(pages, budget, overlap_chars):
+    """(page_number, text) pieces no larger than the budget; oversized pages are split with overlap."""
+    for page_number, text in pages:
+        tokens = estimate_tokens(text) + estimate_tokens(PAGE_MARKER.format(page_number))
+        if tokens <= budget:
+            yield page_number, text
+            continue
+        max_chars = max(1, int(len(text) * budget / tokens))
+        for _, piece in split_text(text, max_chars, overlap_chars):
+            yield page_number, piece
+
+
+def pack_pages(pages, budget, overlap_chars=OVERLAP_CHARS):
+    """Bin consecutive (page_number, text) pages into packs of at most `budget` tokens.
+
+    Returns a list of packs, each a list of (page_number, text) segments in page order.
+    """
+    packs = []
+    current, used = [], 0
+    for page_number, text in _segments(pages, budget, overlap_chars):
+        tokens = estimate_tokens(text) + estimate_tokens(PAGE_MARKER.format(page_number))
+        if current and used + tokens > budget:
+            packs.append(current)
+            current, used = [], 0
+        current.append((page_number, text))
+        used += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+
+def build_packed_prompt(pack):
+    """User prompt for one pack; a single segment keeps the plain one-page prompt."""
+    if len(pack) == 1:
+        return f"Text:\n{pack[0][1]} Scan the text for any PII."
+    body = "\n".join(f"{PAGE_MARKER.format(page_number)}\n{text}" for page_number, text in pack)
+    return f"Text:\n{body}\n{PACKED_INSTRUCTIONS}"
+
+
+def demux(items, pack):
+    """Split the LLM's JSON array for one pack back into {page_number: [items]}.
+
+    Items are routed by their "page" field. If it is missing or names a page that
+    isn't in the pack, the item goes to the first segment whose text contains the
+    value, and otherwise to the first page of the pack.
+    """
+    pages = [page_number for page_number, _ in pack]
+    by_page = {page_number: [] for page_number in pages}
+    seen = set()
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        page_number = item.get("page")
+        try:
+            page_number = int(page_number)
+        except (TypeError, ValueError):
+            page_number = None
+        if page_number not in by_page:
+            value = str(item.get("value", ""))
+            page_number = next((p for p, text in pack if value and value in text), pages[0])
+        key = (page_number, item.get("value"), item.get("type"))
+        if key in seen:
+            continue
+        seen.add(key)
+        by_page[page_number].append({k: v for k, v in item.items() if k != "page"})
+    return by_page
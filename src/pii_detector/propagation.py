@@ -0,0 +1,166 @@
+from collections import deque
+
+# Confirmed full names of these types also match their first-name-only and surname-only mentions
+NAME_TYPES = {"PERSON"}
+# Name variants rank below the full name, so the full name wins where both match (see spans.resolve)
+VARIANT_SCORE = 0.8
+# Titles are not part of a name: "Mr. Smith" must not make every "Mr." in the document PII
+HONORIFICS = {"mr", "mrs", "ms", "miss", "mx", "dr", "prof", "sir", "madam", "dame", "lord", "lady",
+              "г-н", "г-жа", "г-ца", "д-р", "проф"}
+
+
+def _fold(text):
+    """Lower-case text without changing its length, so positions stay valid."""
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+def normalize(value):
+    """The form patterns are matched in: case-folded, whitespace runs collapsed to one space."""
+    return " ".join(_fold(value).split())
+
+
+class Automaton:
+    """Aho-Corasick automaton: every added pattern is found in one pass over the text.
+
+    Matching is case-insensitive, any whitespace run in the text matches one
+    space in a pattern (PDF text breaks names across lines), and matches must
+    start and end on word boundaries. Patterns can be added at any time; the
+    failure links are rebuilt on the next find().
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]  # (pattern length, payload) per state, including what the failure links reach
+        self._own = [[]]  # the same, only for patterns ending exactly here
+        self._dirty = False
+
+    def __len__(self):
+        return sum(len(own) for own in self._own)
+
+    def add(self, pattern, payload):
+        pattern = normalize(pattern)
+        if not pattern:
+            return
+        state = 0
+        for c in pattern:
+            nxt = self._goto[state].get(c)
+            if nxt is None:
+                nxt = self._goto[state][c] = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._own.append([])
+            state = nxt
+        if (len(pattern), payload) not in self._own[state]:
+            self._own[state].append((len(pattern), payload))
+            self._dirty = True
+
+    def _build(self):
+        self._out = [list(own) for own in self._own]
+        queue = deque()
+        for nxt in self._goto[0].values():
+            self._fail[nxt] = 0
+            queue.append(nxt)
+        while queue:
+            state = queue.popleft()
+            for c, nxt in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and c not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(c, 0)
+                self._out[nxt].extend(self._out[self._fail[nxt]])
+                queue.append(nxt)
+        self._dirty = False
+
+    def find(self, text):
+        """Yield (start, end, payload) for every word-bounded match in text, in order of end position."""
+        if self._dirty:
+            self._build()
+        goto, fail, out = self._goto, self._fail, self._out
+        positions = []  # text index of each character fed to the automaton
+        state = 0
+        previous_space = False
+        for i, c in enumerate(_fold(text)):
+            if c.isspace():
+                if previous_space:
+                    continue
+                c = " "
+                previous_space = True
+            else:
+                previous_space = False
+            positions.append(i)
+            while state and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+            if not out[state] or (i + 1 < len(text) and text[i + 1].isalnum()):
+                continue
+            for length, payload in out[state]:
+                start = positions[-length]
+                if start == 0 or not text[start - 1].isalnum():
+                    yield start, i + 1, payload
+
+
+def name_variants(full_name):
+    """First-name-only and surname-only forms of a full name.
+
+    Honorifics, abbreviations (words ending in ".") and single-letter initials
+    are dropped first; a name with fewer than two words left has no variants.
+    """
+    words = [word for word in full_name.split()
+             if len(word) > 1 and not word.endswith(".") and _fold(word) not in HONORIFICS]
+    if len(words) < 2:
+        return []
+    return list(dict.fromkeys((words[0], words[-1])))
+
+
+class Propagator:
+    """Document-wide index of confirmed PII values and the name variants they make PII.
+
+    Values added without a page are matched on every page; a page-local value
+    (e.g. an item the LLM marked as partial) only on its own page. find()
+    returns detection dicts with exact character offsets, overlapping matches
+    included; spans.resolve picks between them.
+    """
+
+    def __init__(self, variant_score=VARIANT_SCORE):
+        self.variant_score = variant_score
+        self.automaton = Automaton()
+        self._variants = {}  # normalized variant -> the full name it comes from
+
+    def add(self, value, pii_type, source=None, page_number=None):
+        if not isinstance(value, str) or not isinstance(pii_type, str) or not value.strip():
+            return
+        self.automaton.add(value, (pii_type, source, 1.0, page_number))
+        if pii_type in NAME_TYPES and page_number is None:
+            for variant in name_variants(value):
+                self.automaton.add(variant, (pii_type, "propagation", self.variant_score, None))
+                self._variants.setdefault(normalize(variant), value)
+
+    def add_items(self, items, page_number=None, source=None):
+        """Add {"value", "type"} items. Partial ones (is_full False, or a one-word name) stay local to page_number.
+
+        source is used for items that don't name their own (LLM answers).
+        """
+        for item in items:
+            if not isinstance(item, dict) or not isinstance(item.get("value"), str):
+                continue
+            partial = item.get("is_full") is False or (item.get("type") in NAME_TYPES and len(item["value"].split()) < 2)
+            self.add(item["value"], item.get("type"), item.get("source", source), page_number if partial else None)
+
+    def full_name_of(self, partial):
+        """The confirmed full name a first-name-only or surname-only mention belongs to, or None."""
+        return self._variants.get(normalize(partial))
+
+    def find(self, text, page_number=None):
+        """Detections for every indexed value on the page; values added without a source get "propagation"."""
+        detections = []
+        for start, end, (pii_type, item_source, score, only_page) in self.automaton.find(text):
+            if only_page is not None and only_page != page_number:
+                continue
+            detections.append({"type": pii_type, "text": text[start:end], "start": start, "end": end,
+                               "score": score, "source": item_source or "propagation"})
+        return detections
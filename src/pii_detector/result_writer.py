@@ -0,0 +1,59 @@
+import json
+
+INDEX_SUFFIX = ".idx.json"
+
+
+class ResultWriter:
+    """Append-only JSONL writer for per-page results, one compact line per page.
+
+    Records must be written in page order (see streams.in_order). With
+    index=True a <path>.idx.json file mapping each page number to its line's
+    byte offset and length is written on close, so single pages can be read
+    without parsing the whole file.
+    """
+
+    def __init__(self, path, index=False):
+        self.path = str(path)
+        self.index_path = self.path + INDEX_SUFFIX if index else None
+        self.count = 0
+        self._offset = 0
+        self._entries = []
+        self._file = open(self.path, "wb")
+
+    def write(self, record):
+        line = (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        self._file.write(line)
+        if self.index_path:
+            self._entries.append([record.get("page_number"), self._offset, len(line)])
+        self._offset += len(line)
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+        if self.index_path:
+            with open(self.index_path, "w", encoding="utf-8") as f:
+                json.dump({"results": self.path, "pages": self._entries}, f, separators=(",", ":"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def read_results(path):
+    """Iterate the records of a ResultWriter file in order."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_page_result(path, page_number):
+    """One page's record, looked up through the index written next to the results."""
+    with open(str(path) + INDEX_SUFFIX, "r", encoding="utf-8") as f:
+        entries = {entry[0]: entry for entry in json.load(f)["pages"]}
+    _, offset, length = entries[page_number]
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return json.loads(f.read(length))
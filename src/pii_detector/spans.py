@@ -0,0 +1,72 @@
+from bisect import bisect_right
+
+# When detections overlap, the higher ranked one wins: type priority first, then source priority,
+# then score, then length. Unlisted types and sources rank 0.
+TYPE_PRIORITY = {
+    # Checksum-validated identifiers: a phone or date match inside one of these is a false positive
+    "CREDIT_CARD": 4, "IBAN_CODE": 4, "BG_EGN": 4, "BG_LNCH": 4, "NATIONAL_ID": 4,
+    "EMAIL_ADDRESS": 3, "IP_ADDRESS": 3, "PHONE_NUMBER": 3,
+    # A name inside an organisation or address is masked as the person
+    "PERSON": 2,
+    "ORG": 1, "GPE": 1, "LOC": 1, "LOCATION": 1, "NRP": 1,
+}
+SOURCE_PRIORITY = {"regex": 3, "llm": 2, "presidio": 1, "spacy": 0}
+
+# Everything resolve() decides by; part of the detection cache keys.
+# min_score drops detections of a type scoring below it before resolution.
+RULES = {"type_priority": TYPE_PRIORITY, "source_priority": SOURCE_PRIORITY, "min_score": {}}
+
+
+def _rank_key(rules):
+    type_priority = rules.get("type_priority", {})
+    source_priority = rules.get("source_priority", {})
+
+    def key(d):
+        return (-type_priority.get(d["type"], 0), -source_priority.get(d.get("source"), 0), -d.get("score", 0),
+                d["start"] - d["end"], d["start"])
+    return key
+
+
+def _resolve_cluster(cluster, key):
+    """Pick the non-overlapping winners of one group of transitively overlapping spans, best ranked first."""
+    starts, ends, kept = [], [], []
+    for d in sorted(cluster, key=key):
+        i = bisect_right(starts, d["start"])
+        if (i > 0 and ends[i - 1] > d["start"]) or (i < len(starts) and starts[i] < d["end"]):
+            continue
+        starts.insert(i, d["start"])
+        ends.insert(i, d["end"])
+        kept.insert(i, d)
+    return kept
+
+
+def resolve(detections, rules=RULES):
+    """Resolve overlapping detection dicts into non-overlapping spans, in text order.
+
+    Detections are sorted by start and swept once; each run of transitively
+    overlapping spans is settled on its own, keeping the best ranked span
+    (see RULES) and then every lower ranked one that overlaps nothing kept.
+    Exact duplicates collapse to one, nested and partial overlaps go to the
+    winner. O(n log n) for the sort plus the per-cluster work, which is small
+    unless a page is one huge overlapping run.
+    """
+    min_score = rules.get("min_score", {})
+    candidates = [d for d in detections
+                  if d["end"] > d["start"] and d.get("score", 0) >= min_score.get(d["type"], 0)]
+    candidates.sort(key=lambda d: (d["start"], -d["end"]))
+
+    key = _rank_key(rules)
+    resolved = []
+    cluster = []
+    cluster_end = 0
+    for d in candidates:
+        if cluster and d["start"] >= cluster_end:
+            resolved.extend(cluster if len(cluster) == 1 else _resolve_cluster(cluster, key))
+            cluster = []
+        if not cluster or d["end"] > cluster_end:
+            cluster_end = d["end"]
+        cluster.append(d)
+    if cluster:
+        resolved.extend(cluster if len(cluster) == 1 else _resolve_cluster(cluster, key))
+    return resolved
+
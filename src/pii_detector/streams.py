@@ -0,0 +1,62 @@
+import collections
+import queue
+import threading
+from concurrent.futures import Future
+
+_DONE = object()
+
+
+class _Failed:
+    def __init__(self, error):
+        self.error = error
+
+
+def threaded(iterable, maxsize=64):
+    """Iterate `iterable` in a background thread, at most maxsize items ahead of the consumer.
+
+    This turns a generator into a pipeline stage: it runs concurrently with
+    whatever consumes it, and blocks (backpressure) once the queue is full.
+    An exception in the producer is re-raised in the consumer.
+    """
+    items = queue.Queue(maxsize)
+
+    def produce():
+        try:
+            for item in iterable:
+                items.put(item)
+        except BaseException as e:
+            items.put(_Failed(e))
+        else:
+            items.put(_DONE)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item = items.get()
+        if item is _DONE:
+            return
+        if isinstance(item, _Failed):
+            raise item.error
+        yield item
+
+
+def in_order(futures, window):
+    """Yield the results of an iterable of futures in order, with at most `window` of them pending.
+
+    The iterable is consumed lazily, so when it submits work as it goes, no more
+    than `window` tasks are queued, running or finished-but-not-yet-consumed:
+    the pending deque is the reorder buffer.
+    """
+    pending = collections.deque()
+    for future in futures:
+        pending.append(future)
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def completed(value):
+    """An already finished future, for results that need no work (e.g. cache hits)."""
+    future = Future()
+    future.set_result(value)
+    return future
@@ -1,62 +1,182 @@
-from presidio_analyzer import AnalyzerEngine, PatternRecognizer, Pattern, RecognizerRegistry
-import spacy
-import torch
+import gc
 import os
 
+from pii_detector.cache import DetectionCache
+from pii_detector.chunking import CHUNK_CHARS, OVERLAP_CHARS, analyze_chunked, analyze_many_chunked
+from pii_detector.dedup import is_blank
+from pii_detector.spans import RULES as SPAN_RULES, resolve
+from pii_detector.structured import CUSTOM_PATTERNS
+
+MODEL_NAME = "en_core_web_trf"
+SPACY_LABELS = ["PERSON", "ORG", "GPE", "LOC"]
+EXCLUDED_RECOGNIZERS = ["DateTimeRecognizer", "UrlRecognizer"]
+
+# Everything that changes the detections; part of the cache key
+ANALYZER_CONFIG = {
+    "model": MODEL_NAME,
+    "language": "en",
+    "spacy_labels": SPACY_LABELS,
+    "excluded_recognizers": EXCLUDED_RECOGNIZERS,
+    "custom_patterns": CUSTOM_PATTERNS,
+    "score_threshold": None,
+    "chunk_chars": CHUNK_CHARS,
+    "overlap_chars": OVERLAP_CHARS,
+    "span_rules": SPAN_RULES,
+}
+
 # Worker globals
 _nlp = None
 _analyzer = None
 _initialized = False
 _worker_id = None
+_cache = None
 
 
 def init_on_gpu(gpu_id):
-    """Initialize on specific GPU."""
+    """Initialize on specific GPU, or on CPU when gpu_id is None or CUDA is unavailable."""
     global _nlp, _analyzer, _initialized, _worker_id
 
     if _initialized:
         return
 
-    _worker_id = gpu_id
-    torch.cuda.set_device(gpu_id)
-    _nlp = spacy.load("en_core_web_trf")
-
-    cc_pattern = Pattern(name="credit_card", regex=r"\b\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b", score=0.9)
-    phone_pattern = Pattern(name="phone", regex=r"\b\d{3}[-.]?\d{4}\b", score=0.8)
+    # Heavy imports are deferred to here, so importing this module (and --help) stays fast
+    import torch
+    from presidio_analyzer import AnalyzerEngine, PatternRecognizer, Pattern, RecognizerRegistry
+    from presidio_analyzer.nlp_engine import NlpEngineProvider
 
-    cc_recognizer = PatternRecognizer(supported_entity="CREDIT_CARD", patterns=[cc_pattern])
-    phone_recognizer = PatternRecognizer(supported_entity="PHONE_NUMBER", patterns=[phone_pattern])
+    _worker_id = gpu_id
+    on_gpu = gpu_id is not None and torch.cuda.is_available()
+    if on_gpu:
+        torch.cuda.set_device(gpu_id)
+
+    # One spaCy pipeline per worker, shared by Presidio and our own NER pass
+    provider = NlpEngineProvider(nlp_configuration={
+        "nlp_engine_name": "spacy",
+        "models": [{"lang_code": "en", "model_name": MODEL_NAME}],
+    })
+    nlp_engine = provider.create_engine()
+    _nlp = nlp_engine.nlp["en"]
 
     registry = RecognizerRegistry()
-    registry.load_predefined_recognizers()
-    registry.recognizers = [r for r in registry.recognizers if r.name not in ["DateTimeRecognizer", "UrlRecognizer"]]
+    registry.load_predefined_recognizers(nlp_engine=nlp_engine)
+    registry.recognizers = [r for r in registry.recognizers if r.name not in EXCLUDED_RECOGNIZERS]
 
-    _analyzer = AnalyzerEngine(registry=registry)
-    _analyzer.registry.add_recognizer(cc_recognizer)
-    _analyzer.registry.add_recognizer(phone_recognizer)
+    _analyzer = AnalyzerEngine(registry=registry, nlp_engine=nlp_engine)
+    for entity, name, regex, score in CUSTOM_PATTERNS:
+        pattern = Pattern(name=name, regex=regex, score=score)
+        _analyzer.registry.add_recognizer(PatternRecognizer(supported_entity=entity, patterns=[pattern]))
 
     _initialized = True
-    print(f"Worker initialized on GPU {gpu_id}")
+    print(f"Worker initialized on GPU {gpu_id}" if on_gpu else f"Worker {os.getpid()} initialized on CPU")
+
+
+def preload_for_fork():
+    """Load the models on CPU in the parent, so forked workers share the weights copy-on-write."""
+    init_on_gpu(None)
+    # Freeze everything allocated so far: the children's GC then never writes to these
+    # objects' headers, which would copy the pages holding them into every worker
+    gc.collect()
+    gc.freeze()
+
+
+def set_torch_threads(num_threads):
+    """Limit torch's intra-op threads in this process, so N workers don't run N x cores threads."""
+    import torch
+    torch.set_num_threads(num_threads)
+
+
+def set_cache(cache_path, max_bytes=None):
+    """Put a persistent detection cache in front of analyze_text / analyze_pages."""
+    global _cache
+    kwargs = {"max_bytes": max_bytes} if max_bytes else {}
+    _cache = DetectionCache(cache_path, ANALYZER_CONFIG, **kwargs) if cache_path else None
+    return _cache
+
+
+def init_worker(gpu_id=None):
+    """Pool initializer: load the models once, before the worker takes any task."""
+    init_on_gpu(gpu_id)
+
+
+def analyze_text_worker(args):
+    """Analyze text in an initialized pool worker. args = (page_num, text)."""
+    page_num, text = args
+    return analyze_text((page_num, text, _worker_id))
 
 
 def analyze_text(args):
     """Analyze text. args = (page_num, text, gpu_id)."""
     page_num, text, gpu_id = args
 
-    # Initialize on first call
-    init_on_gpu(gpu_id)
+    # Blank and near-empty pages return before any logging, cache lookup or model loading
+    if is_blank(text):
+        return {"page_number": page_num, "detections": []}
 
     # Progress log every 10 pages
     if page_num % 10 == 0:
-        print(f"  GPU {gpu_id} processing page {page_num}")
+        print(f"  {'CPU' if gpu_id is None else f'GPU {gpu_id}'} processing page {page_num}")
 
-    if not text or len(text.strip()) == 0:
-        return {"page_number": page_num, "detections": []}
+    if _cache is not None:
+        cached = _cache.get(text)
+        if cached is not None:
+            return {"page_number": page_num, "detections": cached}
+
+    # Initialize on first call
+    init_on_gpu(gpu_id)
 
+    # Long pages are analyzed in overlapping windows, so memory stays flat and nothing is cut off.
+    # Overlapping Presidio and spaCy spans are resolved to one span each (see spans.RULES)
+    result = {"page_number": page_num, "detections": resolve(analyze_chunked(text, _analyze_window))}
+    if _cache is not None:
+        _cache.put(text, result["detections"])
+    return result
+
+
+def analyze_pages(pages, gpu_id=0, batch_size=32, n_process=1):
+    """Analyze (page_num, text) pairs through nlp.pipe. Yields results in input order."""
+    pages = list(pages)
+    non_empty = [i for i, (_, text) in enumerate(pages) if not is_blank(text)]
+    cached = {}
+    if _cache is not None:
+        hits, _ = _cache.split([pages[i][1] for i in non_empty])
+        cached = {non_empty[j]: detections for j, detections in hits.items()}
+
+    texts = [pages[i][1] for i in non_empty if i not in cached]
+    if texts:
+        init_on_gpu(gpu_id)
+
+        def analyze_windows(windows):
+            # process_batch yields in input order, so results line up with the windows
+            for window, nlp_artifacts in _analyzer.nlp_engine.process_batch(
+                    windows, "en", batch_size=batch_size, n_process=n_process):
+                yield _collect_detections(window, nlp_artifacts)
+
+        analyzed = analyze_many_chunked(texts, analyze_windows)
+
+    for i, (page_num, text) in enumerate(pages):
+        if is_blank(text):
+            yield {"page_number": page_num, "detections": []}
+        elif i in cached:
+            yield {"page_number": page_num, "detections": cached[i]}
+        else:
+            result = {"page_number": page_num, "detections": resolve(next(analyzed))}
+            if _cache is not None:
+                _cache.put(text, result["detections"])
+            yield result
+
+
+def _analyze_window(text):
+    """Run the spaCy pipeline once and hand the artifacts to Presidio."""
+    nlp_artifacts = _analyzer.nlp_engine.process_text(text, "en")
+    return _collect_detections(text, nlp_artifacts)
+
+
+def _collect_detections(text, nlp_artifacts):
+    """Presidio and spaCy detections from one set of NLP artifacts."""
     detections = []
 
     # Presidio
-    for r in _analyzer.analyze(text=text, language="en"):
+    for r in _analyzer.analyze(text=text, language="en", nlp_artifacts=nlp_artifacts):
         detections.append({
             "type": r.entity_type,
             "text": text[r.start:r.end],
@@ -66,10 +186,9 @@ def analyze_text(args):
             "source": "presidio"
         })
 
-    # spaCy NER
-    doc = _nlp(text[:50000])
-    for ent in doc.ents:
-        if ent.label_ in ["PERSON", "ORG", "GPE", "LOC"]:
+    # spaCy NER - nlp_artifacts.tokens is the parsed Doc, with the original labels
+    for ent in nlp_artifacts.tokens.ents:
+        if ent.label_ in SPACY_LABELS:
             detections.append({
                 "type": ent.label_,
                 "text": ent.text,
@@ -79,11 +198,5 @@ def analyze_text(args):
                 "source": "spacy"
             })
 
-    # Deduplicate
-    seen = {}
-    for d in detections:
-        key = (d["start"], d["end"])
-        if key not in seen or d["score"] > seen[key]["score"]:
-            seen[key] = d
+    return detections
 
-    return {"page_number": page_num, "detections": list(seen.values())}
\ No newline at end of file
@@ -0,0 +1,257 @@
+import collections
+import os
+import queue
+from multiprocessing import get_context
+
+from pii_detector.cache import DetectionCache
+from pii_detector.dedup import NEAR_EMPTY_CHARS, is_blank
+from pii_detector.page_store import PageStore
+from pii_detector.text_analyzer import (ANALYZER_CONFIG, init_worker, analyze_text_worker, preload_for_fork,
+                                        set_torch_threads)
+
+
+def _init_pool_worker(slots, num_gpus, torch_threads=None):
+    """Pool initializer: claim a worker slot, pin it to its CPUs, then load the models once.
+
+    Forked workers inherit the parent's loaded models, so init_worker returns at once.
+    """
+    try:
+        worker_index, cpu_ids = slots.get_nowait()
+    except queue.Empty:
+        # Replacement for a worker that died; run unpinned on the first GPU
+        worker_index, cpu_ids = 0, None
+
+    if cpu_ids and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpu_ids)
+    if torch_threads:
+        set_torch_threads(len(cpu_ids) if cpu_ids else torch_threads)
+
+    init_worker(worker_index % num_gpus if num_gpus else None)
+
+
+def _analyze_task(task):
+    index, page_num, text = task
+    return index, analyze_text_worker((page_num, text))
+
+
+_stores = {}
+
+
+def _analyze_stored_task(task):
+    # The worker maps the page store itself; only the page index crosses the pipe
+    index, store_path = task
+    if store_path not in _stores:
+        _stores[store_path] = PageStore(store_path)
+    page_num, text = _stores[store_path][index]
+    return index, analyze_text_worker((page_num, text))
+
+
+def longest_first(pages, indices=None):
+    """Indices of (page_num, text) pairs ordered by text length, longest first."""
+    indices = range(len(pages)) if indices is None else indices
+    return sorted(indices, key=lambda i: len(pages[i][1] or ""), reverse=True)
+
+
+def process_memory(pid):
+    """{"rss", "peak_rss", "pss"} in bytes for a process, read from /proc (Linux only), or None.
+
+    PSS splits shared pages between the processes sharing them, so summing PSS
+    over copy-on-write workers counts the shared model weights once.
+    """
+    memory = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    memory["rss" if line.startswith("VmRSS") else "peak_rss"] = int(line.split()[1]) * 1024
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    memory["pss"] = int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return memory
+
+
+def split_cpus(num_workers, cpus=None):
+    """Split the available CPUs into num_workers contiguous, non-empty groups."""
+    if cpus is None:
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count()))
+    per_worker = max(1, len(cpus) // num_workers)
+    return [cpus[i * per_worker:(i + 1) * per_worker] or [cpus[i % len(cpus)]] for i in range(num_workers)]
+
+
+class AnalyzerPool:
+    """Persistent pool of analyzer workers, reused across documents.
+
+    Every worker loads its models once in the initializer. Pages are queued longest
+    first and handed out one at a time, so idle workers keep pulling work until the
+    queue is empty instead of waiting on a fixed round-robin share.
+
+    With a cache_path, pages are looked up in the parent first and only misses are
+    sent to the workers; the workers are not started until the first miss.
+
+    start_method="fork" is a CPU-only mode: the parent loads the models once,
+    freezes its GC heap and forks the workers, which share the weights
+    copy-on-write instead of each loading a copy. On CPU every worker's torch
+    thread count is capped (torch_threads, default: cores / workers).
+    """
+
+    def __init__(self, num_workers=None, num_gpus=0, cpu_affinity=False, start_method="spawn", cache_path=None,
+                 torch_threads=None):
+        if start_method == "fork" and num_gpus:
+            raise ValueError("fork mode is CPU-only: CUDA can't be initialized in forked workers")
+        self.num_gpus = num_gpus
+        self.num_workers = num_workers or num_gpus or os.cpu_count()
+        if torch_threads is None and not num_gpus:
+            torch_threads = max(1, os.cpu_count() // self.num_workers)
+        self.torch_threads = torch_threads
+        self.pages = 0
+        self.cache = DetectionCache(cache_path, ANALYZER_CONFIG) if cache_path else None
+        self._pool = None
+
+        if cpu_affinity is True:
+            self._cpu_groups = split_cpus(self.num_workers)
+        elif cpu_affinity:
+            self._cpu_groups = list(cpu_affinity)
+        else:
+            self._cpu_groups = [None] * self.num_workers
+        if cpu_affinity and not hasattr(os, "sched_setaffinity"):
+            print("CPU affinity is not supported on this platform, workers will not be pinned")
+
+        self.start_method = start_method
+        self._ctx = get_context(start_method)
+        if self.cache is None:
+            self._start()
+
+    def _start(self):
+        slots = self._ctx.Queue()
+        for worker_index in range(self.num_workers):
+            slots.put((worker_index, self._cpu_groups[worker_index % len(self._cpu_groups)]))
+
+        if self.start_method == "fork":
+            preload_for_fork()
+        self._pool = self._ctx.Pool(processes=self.num_workers, initializer=_init_pool_worker,
+                                    initargs=(slots, self.num_gpus, self.torch_threads))
+
+    def analyze(self, pages):
+        """Analyze (page_num, text) pairs. Returns the results in input order."""
+        results = [None] * len(pages)
+        self.pages += len(pages)
+        todo = self._from_cache(pages, results)
+        if not todo:
+            return results
+        if self._pool is None:
+            self._start()
+
+        tasks = [(i, pages[i][0], pages[i][1]) for i in longest_first(pages, todo)]
+        for index, result in self._pool.imap_unordered(_analyze_task, tasks, chunksize=1):
+            results[index] = result
+            if self.cache is not None:
+                self.cache.put(pages[index][1], result["detections"])
+        return results
+
+    def analyze_store(self, store_path):
+        """Analyze every page of a page store. Returns the results in page order.
+
+        Workers open the store themselves and read pages by index, so page text
+        never passes through the parent or the task pipes (except for cache lookups
+        and for checking whether short pages are blank).
+        """
+        with PageStore(store_path) as store:
+            results = [None] * len(store)
+            self.pages += len(store)
+            todo = []
+            for i in range(len(store)):
+                if self.cache is not None or store.byte_lengths[i] <= 4 * NEAR_EMPTY_CHARS:
+                    results[i] = self._lookup(*store[i])
+                if results[i] is None:
+                    todo.append(i)
+            if not todo:
+                return results
+            if self._pool is None:
+                self._start()
+
+            order = sorted(todo, key=lambda i: store.byte_lengths[i], reverse=True)
+            tasks = [(i, store.path) for i in order]
+            for index, result in self._pool.imap_unordered(_analyze_stored_task, tasks, chunksize=1):
+                results[index] = result
+                if self.cache is not None:
+                    self.cache.put(store.text(index), result["detections"])
+        return results
+
+    def imap(self, pages, window=None):
+        """Analyze an iterable of (page_num, text) pairs as it is produced; yield results in input order.
+
+        At most `window` pages (default: two per worker) are in flight, so a slow
+        producer or consumer is never buffered without bound. Pages are not
+        reordered longest first, since the input isn't known up front.
+        """
+        window = window or 2 * self.num_workers
+        pending = collections.deque()
+        for page_num, text in pages:
+            self.pages += 1
+            result = self._lookup(page_num, text)
+            if result is None:
+                if self._pool is None:
+                    self._start()
+                result = self._pool.apply_async(_analyze_task, ((0, page_num, text),))
+            pending.append((text, result))
+            while len(pending) >= window or (pending and isinstance(pending[0][1], dict)):
+                yield self._finish(*pending.popleft())
+        while pending:
+            yield self._finish(*pending.popleft())
+
+    def _finish(self, text, result):
+        if isinstance(result, dict):
+            return result
+        result = result.get()[1]
+        if self.cache is not None:
+            self.cache.put(text, result["detections"])
+        return result
+
+    def _lookup(self, page_num, text):
+        """Result for a blank or cached page, or None if it has to be analyzed."""
+        if is_blank(text):
+            return {"page_number": page_num, "detections": []}
+        detections = self.cache.get(text) if self.cache is not None else None
+        if detections is None:
+            return None
+        return {"page_number": page_num, "detections": detections}
+
+    def _from_cache(self, pages, results):
+        """Fill results for blank and cached pages. Returns the indices still to analyze."""
+        todo = []
+        for i, (page_num, text) in enumerate(pages):
+            results[i] = self._lookup(page_num, text)
+            if results[i] is None:
+                todo.append(i)
+        return todo
+
+    def memory_usage(self):
+        """Summed memory of the parent and the live workers (see process_memory), or None if unavailable."""
+        pids = [os.getpid()] + ([p.pid for p in self._pool._pool] if self._pool is not None else [])
+        usage = [process_memory(pid) for pid in pids]
+        if any(memory is None for memory in usage):
+            return None
+        totals = {key: sum(memory.get(key, 0) for memory in usage) for key in ("rss", "peak_rss", "pss")}
+        totals["workers"] = len(pids) - 1
+        return totals
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+        if self.cache is not None:
+            print(f"Detection cache: {self.cache.stats()}")
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
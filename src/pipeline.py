@@ -0,0 +1,96 @@
+import argparse
+import json
+import time
+from pathlib import Path
+
+from pii_detector.extract import extract_pages, page_count
+from pii_detector.streams import threaded
+from pii_detector.worker_pool import AnalyzerPool
+from step1_extract import page_record
+
+
+def run_pipeline(pdf_path, output_dir: Path, pool: AnalyzerPool, extract_workers=1, queue_size=64, window=None,
+                 keep_step1=False) -> Path:
+    """Extract, analyze and write one PDF as a stream of pages, with no intermediate file.
+
+    Extraction, detection and writing run concurrently, connected by bounded
+    queues. Detections are written to <stem>_detections.jsonl as each page
+    finishes, in page order; keep_step1 also writes the step1 JSONL artifact.
+    """
+    stem = Path(pdf_path).stem
+    header = {"filename": Path(pdf_path).name, "total_pages": page_count(pdf_path)}
+    (output_dir / "step2").mkdir(parents=True, exist_ok=True)
+    output_file = output_dir / "step2" / f"{stem}_detections.jsonl"
+
+    step1_out = None
+    if keep_step1:
+        (output_dir / "step1").mkdir(parents=True, exist_ok=True)
+        step1_out = open(output_dir / "step1" / f"{stem}_text.jsonl", "w", encoding="utf-8")
+        step1_out.write(json.dumps(header, ensure_ascii=False) + "\n")
+
+    def extracted():
+        for page_num, text in extract_pages(pdf_path, workers=extract_workers):
+            record = page_record(page_num, text)
+            if step1_out is not None:
+                step1_out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            yield record
+
+    records = threaded(extracted(), queue_size)
+    char_counts = {}
+
+    def to_analyze():
+        for record in records:
+            char_counts[record["page_number"]] = record["char_count"]
+            yield record["page_number"], record["text"]
+
+    started = time.time()
+    first_result = None
+    pages = 0
+    try:
+        with open(output_file, "w", encoding="utf-8") as f:
+            f.write(json.dumps(header, ensure_ascii=False) + "\n")
+            for result in threaded(pool.imap(to_analyze(), window), queue_size):
+                page_number = result["page_number"]
+                f.write(json.dumps({"page_number": page_number, "char_count": char_counts.pop(page_number),
+                                    "detections": result["detections"]}, ensure_ascii=False) + "\n")
+                f.flush()
+                pages += 1
+                if first_result is None:
+                    first_result = time.time() - started
+    finally:
+        if step1_out is not None:
+            step1_out.close()
+
+    elapsed = time.time() - started
+    print(f"  {pages} pages in {elapsed:.1f}s ({pages / max(elapsed, 1e-9):.1f} pages/s), "
+          f"first result after {first_result or 0:.2f}s")
+    return output_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract and analyze PDFs as a streaming pipeline.")
+    parser.add_argument("pdf_paths", nargs="+")
+    parser.add_argument("--output-dir", type=Path, default=Path("output"))
+    parser.add_argument("--keep-step1", action="store_true", help="also write the step1 JSONL artifact")
+    parser.add_argument("--extract-workers", type=int, default=1, help="processes extracting page ranges")
+    parser.add_argument("--num-gpus", type=int, default=3, help="GPUs to spread workers over (0 = CPU only)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="analyzer processes (default: one per GPU, or one per CPU core)")
+    parser.add_argument("--cpu-affinity", action="store_true", help="pin each worker to its own set of cores")
+    parser.add_argument("--queue-size", type=int, default=64, help="pages buffered between stages")
+    parser.add_argument("--window", type=int, default=None,
+                        help="pages in flight in the analyzer (default: two per worker)")
+    parser.add_argument("--cache", default=None, help="SQLite detection cache path (reuses results for unchanged pages)")
+    args = parser.parse_args()
+
+    with AnalyzerPool(num_workers=args.workers, num_gpus=args.num_gpus, cpu_affinity=args.cpu_affinity,
+                      cache_path=args.cache) as pool:
+        for pdf_path in args.pdf_paths:
+            print(f"Processing {pdf_path}...")
+            output_file = run_pipeline(pdf_path, args.output_dir, pool, extract_workers=args.extract_workers,
+                                       queue_size=args.queue_size, window=args.window, keep_step1=args.keep_step1)
+            print(f"Saved: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
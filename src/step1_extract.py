@@ -1,28 +1,63 @@
+import argparse
 import json
-import sys
 from pathlib import Path
-import fitz
 
+from pii_detector.boxes import BoxIndex, boxes_path
+from pii_detector.extract import extract_pages, page_count, write_jsonl
+from pii_detector.page_store import write_page_store
 
-def extract_pdf_text(pdf_path: str, output_dir: Path) -> Path:
-    """Step 1: Extract text from PDF and save to output/step1/."""
-    doc = fitz.open(pdf_path)
-    pages_data = []
 
-    for page_num in range(len(doc)):
-        page = doc[page_num]
-        text = page.get_text()
-        pages_data.append({
-            "page_number": page_num + 1,
-            "text": text,
-            "char_count": len(text)
-        })
+def page_record(page_num, text):
+    return {
+        "page_number": page_num + 1,
+        "text": text,
+        "char_count": len(text)
+    }
+
+
+def page_records(pdf_path, workers=1, box_index=None):
+    """Step1 page records; with a BoxIndex, each page's character boxes are added to it on the way."""
+    if box_index is None:
+        for page_num, text in extract_pages(pdf_path, workers=workers):
+            yield page_record(page_num, text)
+        return
+    for page_num, text, page_boxes in extract_pages(pdf_path, workers=workers, boxes=True):
+        box_index.add(page_num + 1, len(text), page_boxes)
+        yield page_record(page_num, text)
 
-    doc.close()
 
+def extract_pdf_text(pdf_path: str, output_dir: Path, jsonl: bool = False, workers: int = 1,
+                     store: bool = False, boxes: bool = False) -> Path:
+    """Step 1: Extract text from PDF and save to output/step1/.
+
+    With jsonl=True each page is written as one JSON line as soon as it is
+    extracted, after a {"filename", "total_pages"} header line. With store=True
+    the pages are streamed into a memory-mappable .pages file instead. With
+    boxes=True the character boxes of every page are saved next to the output
+    as well (see boxes.py), so step3 can redact without extracting again.
+    """
     output_dir.mkdir(parents=True, exist_ok=True)
-    output_file = output_dir / f"{Path(pdf_path).stem}_text.json"
+    output_file = output_dir / f"{Path(pdf_path).stem}_text.{'pages' if store else 'jsonl' if jsonl else 'json'}"
+    box_index = BoxIndex() if boxes else None
+    records = page_records(pdf_path, workers, box_index)
+
+    if store:
+        header = {"filename": Path(pdf_path).name, "total_pages": page_count(pdf_path)}
+        write_page_store(output_file, ((p["page_number"], p["text"], {"char_count": p["char_count"]})
+                                       for p in records), header)
+    elif jsonl:
+        header = {"filename": Path(pdf_path).name, "total_pages": page_count(pdf_path)}
+        write_jsonl(records, output_file, header)
+    else:
+        save_step1(pdf_path, list(records), output_file)
 
+    if box_index is not None:
+        box_index.save(boxes_path(output_file))
+    return output_file
+
+
+def save_step1(pdf_path, pages_data, output_file: Path) -> dict:
+    """Write extracted pages in the step1 JSON shape. Returns the saved data."""
     result = {
         "filename": Path(pdf_path).name,
         "total_pages": len(pages_data),
@@ -32,13 +67,22 @@ def extract_pdf_text(pdf_path: str, output_dir: Path) -> Path:
     with open(output_file, "w", encoding="utf-8") as f:
         json.dump(result, f, indent=2, ensure_ascii=False)
 
-    return output_file
+    return result
 
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        pdf_path = sys.argv[1]
-        step1_file = extract_pdf_text(pdf_path, Path("output/step1"))
-        print(f"Step 1 saved: {step1_file}")
-    else:
-        print("Usage: python step1_extract.py <pdf_path>")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Extract text from a PDF.")
+    parser.add_argument("pdf_path")
+    parser.add_argument("--output-dir", type=Path, default=Path("output/step1"))
+    parser.add_argument("--jsonl", action="store_true", help="stream one JSON line per page")
+    parser.add_argument("--store", action="store_true", help="write a memory-mappable .pages store")
+    parser.add_argument("--workers", type=int, default=1, help="processes extracting page ranges in parallel")
+    parser.add_argument("--boxes", action="store_true",
+                        help="also save the character boxes of every page, for step3_mask")
+    args = parser.parse_args()
+
+    step1_file = extract_pdf_text(args.pdf_path, args.output_dir, jsonl=args.jsonl, workers=args.workers,
+                                  store=args.store, boxes=args.boxes)
+    print(f"Step 1 saved: {step1_file}")
+    if args.boxes:
+        print(f"Step 1 saved: {boxes_path(step1_file)}")
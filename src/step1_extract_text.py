@@ -1,21 +1,29 @@
-import sys
-import fitz  # PyMuPDF
+import argparse
 import json
 import os
 
+from pii_detector.boxes import BoxIndex, boxes_path
+from pii_detector.extract import extract_pages, write_jsonl
 
-def extract_text_from_pdf(pdf_path):
-    """Extract text from the given PDF file."""
-    doc = fitz.open(pdf_path)
-    pages = []
-    for page_num in range(len(doc)):
-        page = doc.load_page(page_num)
-        page_text = page.get_text()
-        pages.append({
+
+def iter_text_from_pdf(pdf_path, workers=1, box_index=None):
+    """Yield the text of the given PDF file page by page, in page order.
+
+    With a BoxIndex, each page's character boxes are added to it on the way.
+    """
+    for page in extract_pages(pdf_path, workers=workers, boxes=box_index is not None):
+        page_num, page_text = page[:2]
+        if box_index is not None:
+            box_index.add(page_num + 1, len(page_text), page[2])
+        yield {
             "page_number": page_num + 1,  # Page numbers in the output are 1-based
             "content": page_text
-        })
-    return pages
+        }
+
+
+def extract_text_from_pdf(pdf_path, workers=1, box_index=None):
+    """Extract text from the given PDF file."""
+    return list(iter_text_from_pdf(pdf_path, workers, box_index))
 
 
 def save_text_to_json(pages, output_path):
@@ -25,23 +33,33 @@ def save_text_to_json(pages, output_path):
 
 
 def main():
-    if len(sys.argv) != 3:
-        print("Usage: python step1_extract_text.py <pdf_path> <output_file_path>")
-        sys.exit(1)
-
-    pdf_path = sys.argv[1]
-    output_file_path = sys.argv[2]
+    parser = argparse.ArgumentParser(description="Extract text from a PDF.")
+    parser.add_argument("pdf_path")
+    parser.add_argument("output_file_path", help="a .jsonl path streams one JSON line per page")
+    parser.add_argument("--workers", type=int, default=1, help="processes extracting page ranges in parallel")
+    parser.add_argument("--boxes", action="store_true",
+                        help="also save the character boxes of every page, for step3_mask")
+    args = parser.parse_args()
+    box_index = BoxIndex() if args.boxes else None
 
     # Ensure the output directory exists
-    os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
+    if os.path.dirname(args.output_file_path):
+        os.makedirs(os.path.dirname(args.output_file_path), exist_ok=True)
 
-    print(f"Extracting text from {pdf_path}...")
+    print(f"Extracting text from {args.pdf_path}...")
 
-    # Extract and save text as JSON
-    pages = extract_text_from_pdf(pdf_path)
-    save_text_to_json(pages, output_file_path)
+    if args.output_file_path.endswith(".jsonl"):
+        count = write_jsonl(iter_text_from_pdf(args.pdf_path, args.workers, box_index), args.output_file_path)
+        print(f"{count} pages saved to {args.output_file_path}")
+    else:
+        # Extract and save text as JSON
+        pages = extract_text_from_pdf(args.pdf_path, args.workers, box_index)
+        save_text_to_json(pages, args.output_file_path)
+        print(f"Text saved to {args.output_file_path}")
 
-    print(f"Text saved to {output_file_path}")
+    if box_index is not None:
+        box_index.save(boxes_path(args.output_file_path))
+        print(f"Character boxes saved to {boxes_path(args.output_file_path)}")
 
 
 if __name__ == "__main__":
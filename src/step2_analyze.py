@@ -1,47 +1,103 @@
-import json
-import sys
+import argparse
+import time
 from pathlib import Path
-from multiprocessing import Pool, set_start_method
 
+from pii_detector.dedup import analyze_deduplicated
+from pii_detector.page_store import STORE_SUFFIX, PageStore
+from pii_detector.pages import page_texts, read_step1, save_detections
+from pii_detector.text_analyzer import analyze_pages, set_cache
+from pii_detector.worker_pool import AnalyzerPool
 
-from pii_detector.text_analyzer import init_worker, analyze_text
 
+def analyze_extracted_text(step1_file: Path, output_dir: Path, num_gpus: int = 3, pool: AnalyzerPool = None,
+                           batch_size: int = 0, n_process: int = 1, binary: bool = False, dedup: bool = False) -> Path:
+    """Step 2: Analyze extracted text on a worker pool, or in batches through nlp.pipe.
 
-def analyze_extracted_text(step1_file: Path, output_dir: Path, num_gpus: int = 3) -> Path:
-    """Step 2: Analyze extracted text using multiple GPUs."""
-    with open(step1_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    pages_data = [(p["page_number"], p["text"], i % num_gpus) for i, p in enumerate(data["pages"])]
-    total_pages = len(pages_data)
-
-    print(f"Processing {total_pages} pages across {num_gpus} GPUs...")
-
-    set_start_method("spawn", force=True)
-
-    # Create pool without initializer, pass GPU ID with each task
-    with Pool(processes=num_gpus) as pool:
-        # Map tasks to workers - each worker will init itself on first call
-        results = pool.map(analyze_text, pages_data)
+    A .pages store is not loaded: pool workers map it and read their pages by index.
+    With dedup=True duplicate pages and repeated boilerplate blocks are analyzed
+    once (see dedup.py), which needs the page texts, so a store is read instead.
+    """
+    from_store = step1_file.suffix == STORE_SUFFIX and batch_size <= 0 and not dedup
+    if from_store:
+        with PageStore(step1_file) as store:
+            data = store.to_step1(include_text=False)
+        # Only the page numbers are needed here: the pages carry no text
+        pages = [(p["page_number"], None) for p in (data["pages"] if isinstance(data, dict) else data)]
+    else:
+        data = read_step1(step1_file)
+        pages = page_texts(data)
 
-    # Update data
-    for page, result in zip(data["pages"], results):
-        page["detections"] = result["detections"]
-        del page["text"]
+    def analyze(analyze_fn):
+        return analyze_deduplicated(pages, analyze_fn) if dedup else analyze_fn(pages)
 
-    output_dir.mkdir(parents=True, exist_ok=True)
-    output_file = output_dir / f"{step1_file.stem.replace('_text', '')}_detections.json"
+    def run(analyzer_pool):
+        return analyzer_pool.analyze_store(step1_file) if from_store else analyze(analyzer_pool.analyze)
 
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    if batch_size > 0:
+        print(f"Processing {len(pages)} pages in batches of {batch_size} ({n_process} process(es))...")
+        results = analyze(lambda units: list(analyze_pages(units, batch_size=batch_size, n_process=n_process)))
+    elif pool is not None:
+        print(f"Processing {len(pages)} pages across {pool.num_workers} workers...")
+        results = run(pool)
+    else:
+        with AnalyzerPool(num_gpus=num_gpus) as own_pool:
+            print(f"Processing {len(pages)} pages across {own_pool.num_workers} workers...")
+            results = run(own_pool)
 
-    return output_file
+    return save_detections(data, results, step1_file.stem.replace('_text', ''), output_dir, binary)
 
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        step1_file = Path(sys.argv[1])
-        step2_file = analyze_extracted_text(step1_file, Path("output/step2"), num_gpus=3)
-        print(f"Step 2 saved: {step2_file}")
+    parser = argparse.ArgumentParser(description="Step 2: detect PII in step1 output.")
+    parser.add_argument("step1_files", type=Path, nargs="+", help="step1 JSON, JSONL or .pages path(s)")
+    parser.add_argument("--num-gpus", type=int, default=None,
+                        help="GPUs to spread workers over (0 = CPU only; default: 3, or 0 with --start-method fork)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: one per GPU, or one per CPU core)")
+    parser.add_argument("--cpu-affinity", action="store_true", help="pin each worker to its own set of cores")
+    parser.add_argument("--batch-size", type=int, default=0,
+                        help="stream pages through nlp.pipe in batches of this size instead of using the pool")
+    parser.add_argument("--n-process", type=int, default=1, help="nlp.pipe processes in batch mode")
+    parser.add_argument("--cache", default=None, help="SQLite detection cache path (reuses results for unchanged pages)")
+    parser.add_argument("--start-method", choices=["spawn", "fork"], default="spawn",
+                        help="fork (CPU only): load the models once in the parent and share them copy-on-write")
+    parser.add_argument("--torch-threads", type=int, default=None,
+                        help="torch threads per CPU worker (default: cores / workers)")
+    parser.add_argument("--format", choices=["json", "dets"], default="json",
+                        help="step2 output: indented JSON or the compact binary .dets format")
+    parser.add_argument("--dedup", action="store_true",
+                        help="analyze duplicate pages and repeated headers, footers and disclaimers only once")
+    args = parser.parse_args()
+    if args.num_gpus is None:
+        args.num_gpus = 0 if args.start_method == "fork" else 3
+    elif args.num_gpus and args.start_method == "fork":
+        parser.error("--start-method fork is CPU-only: CUDA can't be initialized in forked workers (use --num-gpus 0)")
+
+    if args.batch_size > 0:
+        cache = set_cache(args.cache)
+        for step1_file in args.step1_files:
+            step2_file = analyze_extracted_text(step1_file, Path("output/step2"),
+                                                batch_size=args.batch_size, n_process=args.n_process,
+                                                binary=args.format == "dets", dedup=args.dedup)
+            print(f"Step 2 saved: {step2_file}")
+        if cache is not None:
+            print(f"Detection cache: {cache.stats()}")
+            cache.close()
     else:
-        print("Usage: python step2_analyze.py <step1_json_path>")
\ No newline at end of file
+        # One pool for all documents, so models are loaded once per worker (or once in total with fork)
+        started = time.time()
+        with AnalyzerPool(num_workers=args.workers, num_gpus=args.num_gpus, cpu_affinity=args.cpu_affinity,
+                          start_method=args.start_method, cache_path=args.cache,
+                          torch_threads=args.torch_threads) as pool:
+            for step1_file in args.step1_files:
+                step2_file = analyze_extracted_text(step1_file, Path("output/step2"), pool=pool,
+                                                    binary=args.format == "dets", dedup=args.dedup)
+                print(f"Step 2 saved: {step2_file}")
+
+            elapsed = time.time() - started
+            print(f"{pool.pages} pages in {elapsed:.1f}s ({pool.pages / max(elapsed, 1e-9):.2f} pages/s, "
+                  f"{args.start_method}, {pool.num_workers} workers, {pool.torch_threads or '-'} torch threads each)")
+            memory = pool.memory_usage()
+            if memory is not None:
+                print(f"Memory (parent + {memory['workers']} workers): RSS {memory['rss'] / 2**20:.0f} MB, "
+                      f"peak RSS {memory['peak_rss'] / 2**20:.0f} MB, PSS {memory['pss'] / 2**20:.0f} MB")
@@ -1,33 +1,26 @@
 import json
 import sys
 from pathlib import Path
-from multiprocessing import Pool, set_start_method
 
 
-# Import after setting CUDA visible devices in main
-from pii_detector.text_analyzer import init_worker, analyze_text_worker
+from pii_detector.pages import read_step1
+from pii_detector.worker_pool import AnalyzerPool
 
 
 def analyze_extracted_text_multi_gpu(step1_file: Path, output_dir: Path, num_gpus: int = 3) -> Path:
     """Step 2: Analyze extracted text using multiple GPUs."""
-    with open(step1_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = read_step1(step1_file)
 
     pages_data = [(p["page_number"], p["text"]) for p in data["pages"]]
     total_pages = len(pages_data)
 
     print(f"Processing {total_pages} pages across {num_gpus} GPUs...")
 
-    # Create pool with one worker per GPU
-    # Each worker gets assigned to a specific GPU
-    gpu_ids = list(range(num_gpus))
-
-    # Use spawn to avoid CUDA fork issues
-    set_start_method("spawn", force=True)
-
-    with Pool(processes=num_gpus, initializer=init_worker, initargs=(0,)) as pool:
-        # Map pages to GPUs round-robin
-        results = pool.map(analyze_text_worker, pages_data)
+    # One worker per GPU; each loads its models in the pool initializer.
+    # The pool uses spawn to avoid CUDA fork issues.
+    with AnalyzerPool(num_gpus=num_gpus) as pool:
+        # Pages are scheduled longest first, so no GPU is left with all the long pages
+        results = pool.analyze(pages_data)
 
     # Update data with results
     for page, result in zip(data["pages"], results):
@@ -49,4 +42,4 @@ if __name__ == "__main__":
         step2_file = analyze_extracted_text_multi_gpu(step1_file, Path("output/step2"), num_gpus=3)
         print(f"Step 2 saved: {step2_file}")
     else:
-        print("Usage: python step2_analyze_multi_gpu.py <step1_json_path>")
\ No newline at end of file
+        print("Usage: python step2_analyze_multi_gpu.py <step1_json_path>")
@@ -1,35 +1,27 @@
-import sys
+import argparse
 import json
-from presidio_analyzer import AnalyzerEngine
-import spacy
 
-# Initialize Presidio analyzer and spaCy model
-analyzer = AnalyzerEngine()
-nlp = spacy.load("en_core_web_trf")
+from pii_detector.analysis_client import AnalysisClient
+from pii_detector.cache import DetectionCache
+from pii_detector.chunking import analyze_chunked, analyze_many_chunked
+from pii_detector.models import batch_analyzer, default_analyzer
+from pii_detector.pages import PRESIDIO_DEFAULT_CACHE_CONFIG, read_step1, to_detections, to_pii_data
 
-# Increase spaCy max_length to handle larger texts, but still mindful of memory usage
-nlp.max_length = 1500000  # Allow longer texts, up to ~1.5 million characters
+# Optional persistent cache, opened in main()
+cache = None
 
 
 def analyze_text_for_pii(text):
     """Analyze text for PII using Presidio and spaCy."""
-    results = analyzer.analyze(text=text, language="en")
-
-    pii_data = []
-    for res in results:
-        pii_data.append({
-            "text_row_number": res.start,  # This is a simple placeholder
-            "column_number": res.end,  # Placeholder for column position
-            "pii_type": res.entity_type,
-            "value": text[res.start:res.end]
-        })
-    return pii_data
+    # Long pages are analyzed in overlapping windows instead of raising nlp.max_length
+    analyzer = default_analyzer()  # loaded on first use
+    detections = analyze_chunked(text, lambda window: to_detections(analyzer.analyze(text=window, language="en")))
+    return to_pii_data(text, detections)
 
 
 def read_json_file(input_file):
     """Read the JSON file containing extracted text."""
-    with open(input_file, "r", encoding="utf-8") as file:
-        return json.load(file)
+    return read_step1(input_file)
 
 
 def save_pii_to_file(pii_data, output_file):
@@ -41,16 +33,60 @@ def save_pii_to_file(pii_data, output_file):
 def analyze_page_for_pii(page_data):
     """Analyze a single page's text for PII."""
     page_text = page_data['content']
+    if cache is not None:
+        return cache.get_or_compute(page_text, analyze_text_for_pii)
     return analyze_text_for_pii(page_text)
 
 
-def main():
-    if len(sys.argv) != 3:
-        print("Usage: python step2_analyze_pii.py <extracted_text_file> <output_file>")
-        sys.exit(1)
+def analyze_pages_batched(pages, batch_size=32, n_process=1):
+    """Analyze all pages through nlp.pipe. Returns one PII list per page, in page order."""
+    texts = [page_data['content'] for page_data in pages]
+    pii_per_page, todo = cache.split(texts) if cache is not None else ({}, list(range(len(texts))))
+
+    def analyze_windows(windows):
+        results = batch_analyzer(default_analyzer()).analyze_iterator(windows, language="en", batch_size=batch_size,
+                                                                      n_process=n_process)
+        return [to_detections(window_results) for window_results in results]
+
+    detections = analyze_many_chunked([texts[i] for i in todo], analyze_windows)
+    for i, page_detections in zip(todo, detections):
+        pii_per_page[i] = to_pii_data(texts[i], page_detections)
+        if cache is not None:
+            cache.put(texts[i], pii_per_page[i])
+    return [pii_per_page[i] for i in range(len(texts))]
 
-    input_file = sys.argv[1]
-    output_file = sys.argv[2]
+
+def analyze_pages_on_server(pages, client):
+    """Like analyze_pages_batched, but through a running analysis_server.py, so no model is loaded here."""
+    texts = [page_data['content'] for page_data in pages]
+    pii_per_page, todo = cache.split(texts) if cache is not None else ({}, list(range(len(texts))))
+    results = client.analyze_pages([(pages[i]['page_number'], texts[i]) for i in todo],
+                                   analyzer="presidio-default") if todo else []
+    for i, result in zip(todo, results):
+        pii_per_page[i] = to_pii_data(texts[i], result["detections"])
+        if cache is not None:
+            cache.put(texts[i], pii_per_page[i])
+    return [pii_per_page[i] for i in range(len(texts))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze extracted text for PII.")
+    parser.add_argument("input_file", help="step1 JSON file")
+    parser.add_argument("output_file")
+    parser.add_argument("--batch-size", type=int, default=0,
+                        help="stream pages through nlp.pipe in batches of this size (0 = one page at a time)")
+    parser.add_argument("--n-process", type=int, default=1, help="nlp.pipe processes in batch mode")
+    parser.add_argument("--cache", default=None, help="SQLite detection cache path (reuses results for unchanged pages)")
+    parser.add_argument("--server", default=None,
+                        help="analyze on a running analysis_server.py at this URL instead of loading the model")
+    args = parser.parse_args()
+
+    global cache
+    if args.cache:
+        cache = DetectionCache(args.cache, PRESIDIO_DEFAULT_CACHE_CONFIG)
+
+    input_file = args.input_file
+    output_file = args.output_file
 
     print(f"Reading text from {input_file} and analyzing for PII...")
 
@@ -59,15 +95,28 @@ def main():
 
     pii_data = []
 
-    # Analyze each page one at a time
-    for page_data in pages:
-        print(f"Analyzing page {page_data['page_number']}...")
-        page_pii = analyze_page_for_pii(page_data)
-        pii_data.extend(page_pii)
+    if args.server:
+        print(f"Analyzing {len(pages)} pages on {args.server}...")
+        for page_pii in analyze_pages_on_server(pages, AnalysisClient(args.server)):
+            pii_data.extend(page_pii)
+    elif args.batch_size > 0:
+        print(f"Analyzing {len(pages)} pages in batches of {args.batch_size}...")
+        for page_pii in analyze_pages_batched(pages, args.batch_size, args.n_process):
+            pii_data.extend(page_pii)
+    else:
+        # Analyze each page one at a time
+        for page_data in pages:
+            print(f"Analyzing page {page_data['page_number']}...")
+            page_pii = analyze_page_for_pii(page_data)
+            pii_data.extend(page_pii)
 
     # Save results to file
     save_pii_to_file(pii_data, output_file)
 
+    if cache is not None:
+        print(f"Detection cache: {cache.stats()}")
+        cache.close()
+
     print(f"PII results saved to {output_file}")
 
 
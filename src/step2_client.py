@@ -0,0 +1,26 @@
+import argparse
+import time
+from pathlib import Path
+
+from pii_detector.analysis_client import SERVER_URL, AnalysisClient
+from pii_detector.pages import read_step1, save_detections
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Step 2 through a running analysis_server.py (no model loading).")
+    parser.add_argument("step1_files", type=Path, nargs="+", help="step1 JSON or JSONL path(s)")
+    parser.add_argument("--server", default=SERVER_URL)
+    parser.add_argument("--output-dir", type=Path, default=Path("output/step2"))
+    args = parser.parse_args()
+
+    client = AnalysisClient(args.server)
+    for step1_file in args.step1_files:
+        t0 = time.time()
+        data = read_step1(step1_file)
+        results = client.analyze_document(data)
+        step2_file = save_detections(data, results, step1_file.stem.replace("_text", ""), args.output_dir)
+        print(f"Step 2 saved: {step2_file} ({len(results)} pages in {time.time() - t0:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,127 +1,132 @@
-import sys
-import json
+import argparse
 import os
-import spacy
-from langdetect import detect
-from presidio_analyzer import AnalyzerEngine
+import sys
 from concurrent.futures import ThreadPoolExecutor
 
-# Initialize Presidio analyzer
-analyzer = AnalyzerEngine()
-
-# Increase spaCy max_length to handle larger texts
-spacy.util.fix_random_seed(42)
+from pii_detector.cache import DetectionCache
+from pii_detector.chunking import analyze_chunked, analyze_many_chunked
+from pii_detector.language import group_by_language
+from pii_detector.models import SPACY_MODELS, analyzer_for, batch_analyzer
+from pii_detector.pages import pii_data_cache_config, read_step1, to_detections, to_pii_data
+from pii_detector.result_writer import ResultWriter
+from pii_detector.streams import in_order
 
+# Analyzer settings that change the output; part of the detection cache key (plus the language)
+CACHE_CONFIG = pii_data_cache_config(analyzer="presidio", models=SPACY_MODELS, score_threshold=0.7)
 
-def load_spacy_model(language):
-    """Load spaCy model based on the detected language."""
-    if language == 'en':
-        return spacy.load("en_core_web_trf")
-    elif language == 'bg':
-        return spacy.load("bg_news_trf")
-    elif language == 'ru':
-        return spacy.load("ru_core_news_lg")
-    else:
-        raise ValueError(f"Unsupported language: {language}")
+# Optional persistent caches, one per language, opened in main() once the page languages are known
+caches = {}
 
 
 def analyze_text_for_pii(text, language):
     """Analyze text for PII using Presidio."""
-    results = analyzer.analyze(text=text, language=language, score_threshold=0.7)
-    pii_data = [{"text_row_number": res.start, "column_number": res.end, "pii_type": res.entity_type,
-                 "value": text[res.start:res.end]} for res in results]
-    return pii_data
+    # Loaded on first use of the language, then reused by every thread
+    analyzer = analyzer_for(language)
+    # Long pages are analyzed in overlapping windows instead of in one spaCy pass
+    detections = analyze_chunked(
+        text, lambda window: to_detections(analyzer.analyze(text=window, language=language, score_threshold=0.7)))
+    return to_pii_data(text, detections)
 
 
-def process_page(page_data, language, output_dir):
-    """Process each page, analyze for PII, and save to a separate file."""
-    page_number = page_data["page_number"]
+def process_page(page_data, language):
+    """Analyze one page for PII in its language."""
     page_text = page_data['content']
+    cache = caches.get(language)
 
-    # PII analysis
-    pii_data = analyze_text_for_pii(page_text, language)
+    if language is None:
+        return []  # empty page, no model needed
+    if cache is not None:
+        return cache.get_or_compute(page_text, lambda text: analyze_text_for_pii(text, language))
+    return analyze_text_for_pii(page_text, language)
 
-    # Save the PII results to a file
-    output_file = f"{output_dir}/page_{page_number}_pii.json"
-    save_pii_to_file(pii_data, output_file)
 
-    return output_file
+def process_pages_batched(pages, language, batch_size, n_process=1):
+    """Stream all pages through nlp.pipe. Returns one pii_data list per page, in page order."""
+    texts = [page_data['content'] for page_data in pages]
+    cache = caches.get(language)
+    pii_per_page, todo = cache.split(texts) if cache is not None else ({}, list(range(len(texts))))
 
+    batch = batch_analyzer(analyzer_for(language))
 
-def read_json_file(input_file):
-    """Read the JSON file containing extracted text."""
-    with open(input_file, "r", encoding="utf-8") as file:
-        return json.load(file)
-
+    def analyze_windows(windows):
+        results = batch.analyze_iterator(windows, language=language, batch_size=batch_size,
+                                         n_process=n_process, score_threshold=0.7)
+        return [to_detections(window_results) for window_results in results]
 
-def save_pii_to_file(pii_data, output_file):
-    """Save PII analysis results to a file."""
-    with open(output_file, "w", encoding="utf-8") as file:
-        json.dump(pii_data, file, ensure_ascii=False, indent=4)
+    detections = analyze_many_chunked([texts[i] for i in todo], analyze_windows)
+    for i, page_detections in zip(todo, detections):
+        pii_per_page[i] = to_pii_data(texts[i], page_detections)
+        if cache is not None:
+            cache.put(texts[i], pii_per_page[i])
 
+    return [pii_per_page[i] for i in range(len(pages))]
 
-def merge_json_files(file_paths, output_file):
-    """Merge multiple JSON files into a single JSON file."""
-    merged_data = []
-    for file_path in file_paths:
-        with open(file_path, "r", encoding="utf-8") as file:
-            merged_data.extend(json.load(file))
 
-    with open(output_file, "w", encoding="utf-8") as output_file:
-        json.dump(merged_data, output_file, ensure_ascii=False, indent=4)
+def read_json_file(input_file):
+    """Read the JSON file containing extracted text."""
+    return read_step1(input_file)
 
 
-def main():
-    if len(sys.argv) != 4:
-        print("Usage: python step2_analyze_pii.py <extracted_text_file> <output_dir> <final_output_file>")
-        sys.exit(1)
+def write_results(writer, pages, results):
+    for page_data, pii_data in zip(pages, results):
+        writer.write({"page_number": page_data['page_number'], "pii": pii_data})
 
-    input_file = sys.argv[1]
-    output_dir = sys.argv[2]
-    final_output_file = sys.argv[3]
 
-    # Ensure output directory exists
-    os.makedirs(output_dir, exist_ok=True)
+def main():
+    parser = argparse.ArgumentParser(description="Analyze extracted text for PII in each page's language.")
+    parser.add_argument("input_file", help="step1 JSON file")
+    parser.add_argument("output_file", help="JSONL results, one {page_number, pii} line per page")
+    parser.add_argument("--batch-size", type=int, default=0,
+                        help="stream pages through nlp.pipe in batches of this size (0 = one thread per page)")
+    parser.add_argument("--n-process", type=int, default=1, help="nlp.pipe processes in batch mode")
+    parser.add_argument("--workers", type=int, default=None, help="threads in thread mode (default: cpu_count + 4, at most 32)")
+    parser.add_argument("--index", action="store_true", help="also write <output_file>.idx.json with line offsets")
+    parser.add_argument("--cache", default=None, help="SQLite detection cache path (reuses results for unchanged pages)")
+    args = parser.parse_args()
 
     # Read the extracted text JSON file
-    pages = read_json_file(input_file)
-
-    # Detect language from the first page's text (in the main thread)
-    first_page_text = pages[0]['content']
+    pages = read_json_file(args.input_file)
+
+    # Every page goes to the analyzer for its own language; mixed documents load one model per language
+    groups = group_by_language([page['content'] for page in pages])
+    languages = [None] * len(pages)
+    for language, indices in groups.items():
+        print(f"Language '{language or 'empty'}': {len(indices)} page(s)")
+        for i in indices:
+            languages[i] = language
     sys.stdout.flush()
 
-    detected_language = None
-    for page in pages:
-        text = page['content'].strip()
-        if len(text) > 50:
-            detected_language = detect(text)
-            print(f"Detected language '{detected_language}' from page {page['page_number']}")
-            break
-
-    if not detected_language:
-        print("Error: No pages with sufficient text found")
-        sys.exit(1)
-    # Print detected language (before parallel processing starts)
-    print(f"Detected language for the document: {detected_language}")
-    sys.stdout.flush()  # Ensure the print statement is flushed immediately to the console
-
-    # Load spaCy model based on detected language
-    try:
-        nlp_model = load_spacy_model(detected_language)
-    except ValueError as e:
-        print(f"Error: {e}")
-        sys.exit(1)
-
-    # Use ThreadPoolExecutor for parallel processing of pages
-    with ThreadPoolExecutor() as executor:
-        # Process each page concurrently
-        futures = [executor.submit(process_page, page_data, detected_language or "en", output_dir) for page_data in pages]
-        result_files = [future.result() for future in futures]
-
-    # After processing all pages, merge the results into one file
-    merge_json_files(result_files, final_output_file)
-
-    print(f"PII analysis results saved to {final_output_file}")
+    if args.cache:
+        for language in groups:
+            if language is not None:
+                caches[language] = DetectionCache(args.cache, dict(CACHE_CONFIG, language=language))
+
+    with ResultWriter(args.output_file, index=args.index) as writer:
+        if args.batch_size > 0:
+            # nlp.pipe wants one language per stream, so each group is analyzed whole, then written in page order
+            results = [None] * len(pages)
+            for language, indices in groups.items():
+                group_pages = [pages[i] for i in indices]
+                if language is None:
+                    group_results = [[] for _ in group_pages]
+                else:
+                    group_results = process_pages_batched(group_pages, language, args.batch_size, args.n_process)
+                for i, pii_data in zip(indices, group_results):
+                    results[i] = pii_data
+            write_results(writer, pages, results)
+        else:
+            # Threads take the pages in page order; each result is written as soon as the pages before it are
+            workers = args.workers or min(32, (os.cpu_count() or 1) + 4)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = (executor.submit(process_page, page_data, language)
+                           for page_data, language in zip(pages, languages))
+                write_results(writer, pages, in_order(futures, window=2 * workers))
+
+    for language, cache in caches.items():
+        print(f"Detection cache ({language}): {cache.stats()}")
+        cache.close()
+
+    print(f"PII analysis results for {writer.count} pages saved to {args.output_file}")
 
 
 if __name__ == "__main__":
@@ -1,30 +1,26 @@
-import sys
-import json
+import argparse
+import collections
 import os
-from concurrent.futures import ProcessPoolExecutor
-from presidio_analyzer import AnalyzerEngine
-import spacy
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
-# Initialize Presidio analyzer and spaCy model
-analyzer = AnalyzerEngine()
-nlp = spacy.load("en_core_web_trf")
+from pii_detector.analysis_client import AnalysisClient
+from pii_detector.cache import DetectionCache
+from pii_detector.chunking import analyze_chunked, analyze_many_chunked
+from pii_detector.models import batch_analyzer, default_analyzer
+from pii_detector.pages import PRESIDIO_DEFAULT_CACHE_CONFIG, read_step1, to_detections, to_pii_data
+from pii_detector.result_writer import ResultWriter
+from pii_detector.streams import completed, in_order
 
-# Increase spaCy max_length to handle larger texts
-nlp.max_length = 1500000  # Allow longer texts, up to ~1.5 million characters
+# Optional persistent cache, opened in main(); workers only analyze, the parent reads and writes it
+cache = None
 
 
 def analyze_text_for_pii(text):
     """Analyze text for PII using Presidio and spaCy."""
-    results = analyzer.analyze(text=text, language="en")
-    pii_data = []
-    for res in results:
-        pii_data.append({
-            "text_row_number": res.start,
-            "column_number": res.end,
-            "pii_type": res.entity_type,
-            "value": text[res.start:res.end]
-        })
-    return pii_data
+    # Long pages are analyzed in overlapping windows instead of raising nlp.max_length
+    analyzer = default_analyzer()  # loaded on first use
+    detections = analyze_chunked(text, lambda window: to_detections(analyzer.analyze(text=window, language="en")))
+    return to_pii_data(text, detections)
 
 
 def analyze_page_for_pii(page_data):
@@ -35,64 +31,112 @@ def analyze_page_for_pii(page_data):
 
 def read_json_file(input_file):
     """Read the JSON file containing extracted text."""
-    with open(input_file, "r", encoding="utf-8") as file:
-        return json.load(file)
-
-
-def save_pii_to_file(pii_data, output_file):
-    """Save PII analysis results to a file."""
-    with open(output_file, "w", encoding="utf-8") as file:
-        json.dump(pii_data, file, ensure_ascii=False, indent=4)
-
-
-def process_page(page_data, output_dir):
-    """Process each page, analyze for PII, and save to a separate file."""
-    page_number = page_data["page_number"]
-    pii_data = analyze_page_for_pii(page_data)
-
-    # Create a separate JSON file for each page's results
-    output_file = os.path.join(output_dir, f"page_{page_number}_pii.json")
-    save_pii_to_file(pii_data, output_file)
-
-    return output_file
-
-
-def merge_json_files(file_paths, output_file):
-    """Merge multiple JSON files into a single JSON file."""
-    merged_data = []
-    for file_path in file_paths:
-        with open(file_path, "r", encoding="utf-8") as file:
-            merged_data.extend(json.load(file))
-
-    with open(output_file, "w", encoding="utf-8") as output_file:
-        json.dump(merged_data, output_file, ensure_ascii=False, indent=4)
+    return read_step1(input_file)
+
+
+def process_page(page_data):
+    """Analyze one page in a worker. Returns [pii_data], like process_batch."""
+    return [analyze_page_for_pii(page_data)]
+
+
+def process_batch(pages_batch, batch_size):
+    """Analyze a slice of pages through nlp.pipe. Returns one pii_data list per page."""
+    texts = [page_data['content'] for page_data in pages_batch]
+    batch = batch_analyzer(default_analyzer())
+    results = analyze_many_chunked(texts, lambda windows: [
+        to_detections(window_results)
+        for window_results in batch.analyze_iterator(windows, language="en", batch_size=batch_size)])
+    return [to_pii_data(text, page_detections) for text, page_detections in zip(texts, results)]
+
+
+def process_on_server(client, pages_batch):
+    """Analyze a slice of pages on a running analysis_server.py. Returns one pii_data list per page."""
+    results = client.analyze_pages([(page_data['page_number'], page_data['content']) for page_data in pages_batch],
+                                   analyzer="presidio-default")
+    return [to_pii_data(page_data['content'], result["detections"])
+            for page_data, result in zip(pages_batch, results)]
+
+
+def page_results(pages, executor, batch_size, window, client=None):
+    """Yield pii_data for every page in page order. Cache hits are not sent to the workers,
+    and newly analyzed pages are added to the cache.
+
+    Tasks are submitted lazily, at most `window` ahead of the page being
+    written, so finished-but-unwritten results never pile up. With an
+    AnalysisClient the tasks are requests to the analysis server (run them on
+    threads), which batches the concurrent ones itself.
+    """
+    sent = collections.deque()  # the pages behind each future, None for cache hits
+
+    def tasks():
+        run = []
+        for page_data in pages:
+            pii_data = cache.get(page_data['content']) if cache is not None else None
+            if pii_data is not None:
+                if run:
+                    yield submit(run)
+                    run = []
+                sent.append(None)
+                yield completed([pii_data])
+                continue
+            run.append(page_data)
+            if len(run) >= max(batch_size, 1):
+                yield submit(run)
+                run = []
+        if run:
+            yield submit(run)
+
+    def submit(run):
+        sent.append(run)
+        if client is not None:
+            return executor.submit(process_on_server, client, run)
+        if batch_size > 0:
+            return executor.submit(process_batch, run, batch_size)
+        return executor.submit(process_page, run[0])
+
+    for pii_list in in_order(tasks(), window):
+        run = sent.popleft()
+        if run is not None and cache is not None:
+            for page_data, pii_data in zip(run, pii_list):
+                cache.put(page_data['content'], pii_data)
+        yield from pii_list
 
 
 def main():
-    if len(sys.argv) != 4:
-        print("Usage: python step2_analyze_pii.py <extracted_text_file> <output_dir> <final_output_file>")
-        sys.exit(1)
-
-    input_file = sys.argv[1]
-    output_dir = sys.argv[2]
-    final_output_file = sys.argv[3]
-
-    # Ensure output directory exists
-    os.makedirs(output_dir, exist_ok=True)
+    parser = argparse.ArgumentParser(description="Analyze extracted text for PII in parallel.")
+    parser.add_argument("input_file", help="step1 JSON file")
+    parser.add_argument("output_file", help="JSONL results, one {page_number, pii} line per page")
+    parser.add_argument("--batch-size", type=int, default=0,
+                        help="send each worker slices of this many pages through nlp.pipe (0 = one page per task)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--index", action="store_true", help="also write <output_file>.idx.json with line offsets")
+    parser.add_argument("--cache", default=None, help="SQLite detection cache path (reuses results for unchanged pages)")
+    parser.add_argument("--server", default=None,
+                        help="send the pages to a running analysis_server.py at this URL; --workers requests "
+                             "are kept in flight and no model is loaded here")
+    args = parser.parse_args()
 
     # Read the extracted text JSON file
-    pages = read_json_file(input_file)
-
-    # Use ProcessPoolExecutor for parallel processing
-    with ProcessPoolExecutor() as executor:
-        # Process each page concurrently
-        futures = [executor.submit(process_page, page_data, output_dir) for page_data in pages]
-        result_files = [future.result() for future in futures]
-
-    # After processing all pages, merge the results into one file
-    merge_json_files(result_files, final_output_file)
-
-    print(f"PII analysis results saved to {final_output_file}")
+    pages = read_json_file(args.input_file)
+
+    global cache
+    if args.cache:
+        cache = DetectionCache(args.cache, PRESIDIO_DEFAULT_CACHE_CONFIG)
+
+    # Results stream from the workers straight into one file, in page order
+    client = AnalysisClient(args.server) if args.server else None
+    executor_class = ThreadPoolExecutor if client is not None else ProcessPoolExecutor
+    with executor_class(max_workers=args.workers) as executor, \
+            ResultWriter(args.output_file, index=args.index) as writer:
+        results = page_results(pages, executor, args.batch_size, window=2 * args.workers, client=client)
+        for page_data, pii_data in zip(pages, results):
+            writer.write({"page_number": page_data['page_number'], "pii": pii_data})
+
+    if cache is not None:
+        print(f"Detection cache: {cache.stats()}")
+        cache.close()
+
+    print(f"PII analysis results for {writer.count} pages saved to {args.output_file}")
 
 
 if __name__ == "__main__":
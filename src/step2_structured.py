@@ -0,0 +1,36 @@
+import argparse
+import json
+import time
+
+from pii_detector.pages import read_step1, page_texts
+from pii_detector.structured import ENTITIES, scan
+
+
+def scan_pages(pages, entities=None):
+    """Structured-only pass: regex + checksum validators, no NLP model."""
+    return [{"page_number": page_num, "detections": scan(text, entities) if text else []} for page_num, text in pages]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Structured-only PII scan (email, phone, card, IBAN, IP, ЕГН/ЛНЧ) without an NLP model.")
+    parser.add_argument("input_file", help="step1 JSON file")
+    parser.add_argument("output_file")
+    parser.add_argument("--entities", nargs="+", choices=ENTITIES, default=None, help="limit the scan to these types")
+    args = parser.parse_args()
+
+    pages = page_texts(read_step1(args.input_file))
+
+    start = time.perf_counter()
+    results = scan_pages(pages, set(args.entities) if args.entities else None)
+    elapsed = time.perf_counter() - start
+
+    with open(args.output_file, "w", encoding="utf-8") as f:
+        json.dump({"filename": args.input_file, "pages": results}, f, indent=2, ensure_ascii=False)
+
+    total = sum(len(r["detections"]) for r in results)
+    print(f"Scanned {len(pages)} pages in {elapsed:.3f}s, {total} detections saved to {args.output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,134 +1,253 @@
-import sys
+import argparse
+import asyncio
 import json
 import os
 
-import requests
-from langdetect import detect
-from presidio_analyzer import AnalyzerEngine
-from presidio_analyzer.nlp_engine import NlpEngineProvider
-
-configuration = {
-    "nlp_engine_name": "spacy",
-    "models": [
-        {"lang_code": "en", "model_name": "en_core_web_sm"},
-        {"lang_code": "bg", "model_name": "bg_news_trf"},
-        {"lang_code": "ru", "model_name": "ru_core_news_sm"},
-    ],
-}
-
-provider = NlpEngineProvider(nlp_configuration=configuration)
-nlp_engine = provider.create_engine()
-
+from pii_detector.cascade import (PARTIAL_NAME, UNCERTAIN_LOW, UNCERTAIN_HIGH, llm_triggers, confident, merge,
+                                  partial_names)
+from pii_detector.dedup import is_blank
+from pii_detector.language import group_by_language
+from pii_detector.llm_cache import DEFAULT_LLM_CACHE_PATH, open_llm_cache
+from pii_detector.models import analyzer_for
+from pii_detector.pages import read_step1
+from pii_detector.ollama_client import AsyncOllamaClient, DEFAULT_MODEL, OLLAMA_URL, map_ordered
+from pii_detector.propagation import Propagator
+from pii_detector.prompt_packer import build_packed_prompt, demux, pack_pages, page_budget, read_num_ctx
+from pii_detector.spans import resolve
+from pii_detector.structured import scan
 
 ENTITIES = ["PERSON", "EMAIL_ADDRESS", "PHONE_NUMBER", "CREDIT_CARD", "IBAN_CODE", "IP_ADDRESS"]
 
 
-def analyze_with_presidio(text, analyzer, language):
+def analyze_with_presidio(text, analyzer, language, score_threshold=0.7):
     lang = language if language in ["en", "de", "es", "fr", "it", "ru", "bg"] else "en"
     print(f"  Presidio language: {lang}")
-    results = analyzer.analyze(text=text, language=lang, entities=ENTITIES, score_threshold=0.7)
-    return [{"value": text[r.start:r.end], "type": r.entity_type, "score": r.score} for r in results]
+    results = analyzer.analyze(text=text, language=lang, entities=ENTITIES, score_threshold=score_threshold)
+    return [{"value": text[r.start:r.end], "type": r.entity_type, "score": r.score, "source": "presidio"}
+            for r in results]
 
 
+def cheap_pass(text, analyzer, language, score_threshold):
+    """Presidio plus the regex scanner; everything down to score_threshold, so uncertain hits are visible."""
+    candidates = analyze_with_presidio(text, analyzer, language, score_threshold)
+    candidates += [{"value": d["text"], "type": d["type"], "score": d["score"], "source": "regex"}
+                   for d in scan(text)]
+    return candidates
 
-def read_json_file(input_file):
-    with open(input_file, "r", encoding="utf-8") as f:
-        return json.load(f)
 
 
-def detect_language(pages):
-    for page in pages:
-        text = page["content"].strip()
-        if len(text) > 50:
-            lang = detect(text)
-            print(f"Detected language '{lang}' from page {page['page_number']}")
-            return lang
-    print("Error: No pages with sufficient text")
-    sys.exit(1)
+def read_json_file(input_file):
+    return read_step1(input_file)
+
 
 def load_system_prompt():
     with open("prompts/system-prompt.txt", "r", encoding="utf-8") as f:
         return f.read()
 
-def call_ollama(page_text, system_prompt, model="qwen3:14b-no-think"):
-    user_prompt = f"Text:\n{page_text} Scan the text for any PII."
-
-    response = requests.post("http://localhost:11434/api/chat", json={
-        "model": model,
-        "stream": False,
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ]
-    }, timeout=100)
-    result = response.json()
-    print(f"  LLM response: {result}")
-    if "message" not in result:
-        print(f"  Ollama error: {result}")
-        return "[]"
-    return result["message"]["content"]
-
-
-def create_analyzer(language):
-    models = {
-        "en": "en_core_web_lg",
-        "bg": "bg_news_trf",
-        "ru": "ru_core_news_lg",
-    }
-
-    model_list = [{"lang_code": "en", "model_name": "en_core_web_lg"}]
-    if language != "en" and language in models:
-        model_list.append({"lang_code": language, "model_name": models[language]})
-
-    configuration = {
-        "nlp_engine_name": "spacy",
-        "models": model_list,
-    }
-    provider = NlpEngineProvider(nlp_configuration=configuration)
-    nlp_engine = provider.create_engine()
-
-    supported = ["en"]
-    if language != "en":
-        supported.append(language)
-
-    return AnalyzerEngine(nlp_engine=nlp_engine, supported_languages=supported)
+def parse_llm_response(llm_response):
+    """The LLM's JSON array, or None if the response is missing or not a JSON array."""
+    if llm_response is None:
+        return None
+    try:
+        llm_pii = json.loads(llm_response)
+    except json.JSONDecodeError:
+        print(f"  Warning: failed to parse LLM response")
+        return None
+    return llm_pii if isinstance(llm_pii, list) else None
+
+
+def settle_partial_names(work, propagator):
+    """Clear the partial-name trigger on pages whose partial names all belong to a full name confirmed
+    anywhere in the document; those names are kept as partial PII without asking the LLM."""
+    settled = 0
+    for entry in work:
+        if PARTIAL_NAME not in entry["reasons"]:
+            continue
+        names = partial_names(entry["candidates"])
+        full_names = [propagator.full_name_of(name) for name in names]
+        if all(full_names):
+            entry["reasons"].remove(PARTIAL_NAME)
+            entry["pii_found"] += [{"value": name, "type": "PERSON", "is_full": False,
+                                    "reason": f"part of {full_name}", "source": "propagation"}
+                                   for name, full_name in zip(names, full_names)]
+            settled += 1
+    return settled
+
+
+async def resolve_pages(work, client, system_prompt, output_file, budget, propagator, cache=None):
+    """Send the pages that need it to the LLM, packed several per request, and write every page in page order.
+
+    Each page's values go into the document-wide propagator as it is written,
+    and its spans are every propagator match on the page: the values confirmed
+    by the cheap pass on any page, and those the LLM confirmed on this or an
+    earlier page, plus the name variants of those full names.
+    """
+    llm_entries = [entry for entry in work if entry["reasons"]]
+    if cache is not None:
+        # Answers are cached per page, so a page answered on an earlier run is not packed again,
+        # whatever else changed in the document
+        misses = []
+        for entry in llm_entries:
+            items = cache.get(entry["text"])
+            if items is None:
+                misses.append(entry)
+            else:
+                entry["pii_found"] = merge(entry["pii_found"], items)
+        print(f"{len(llm_entries) - len(misses)} page(s) answered from the LLM cache")
+        llm_entries = misses
+    packs = pack_pages([(entry["page_number"], entry["text"]) for entry in llm_entries], budget)
+    print(f"{len(llm_entries)} page(s) packed into {len(packs)} LLM request(s)")
+
+    by_page = {entry["page_number"]: entry for entry in work}
+    pieces_left = {}
+    for pack in packs:
+        for page_number, _ in pack:
+            pieces_left[page_number] = pieces_left.get(page_number, 0) + 1
+
+    answers = {}  # page_number -> items from the packs answered so far
+    failed = set()
+
+    async def ask_llm(pack):
+        llm_response = await client.chat(system_prompt, build_packed_prompt(pack))
+        print(f"  Pages {pack[0][0]}-{pack[-1][0]} LLM response: {(llm_response or '')[:100]}...")
+        llm_pii = parse_llm_response(llm_response)
+        return pack, llm_pii is not None, demux(llm_pii or [], pack)
+
+    written = 0
+    with open(output_file, "w", encoding="utf-8") as f:
+        def write_ready():
+            # A page is ready once every pack holding a piece of it has been answered
+            nonlocal written
+            while written < len(work) and pieces_left.get(work[written]["page_number"], 0) == 0:
+                entry = work[written]
+                if "duplicate_of" in entry:
+                    # Written after its original, which has its final answer by now
+                    entry["pii_found"] = [dict(item) for item in entry.pop("duplicate_of")["pii_found"]]
+                # The LLM answers with values only; one automaton pass over the page gives their offsets
+                propagator.add_items(entry["pii_found"], entry["page_number"], source="llm")
+                spans = resolve(propagator.find(entry["content"], entry["page_number"]))
+                result = {"page_number": entry["page_number"], "pii_found": entry["pii_found"], "spans": spans}
+                f.write(json.dumps(result, ensure_ascii=False, indent=2) + "\n")
+                f.flush()
+                written += 1
+
+        write_ready()
+        # Window of 2x the concurrency keeps the server busy without queueing the whole document
+        async for pack, answered, items_by_page in map_ordered(ask_llm, packs, client.concurrency * 2):
+            for page_number, items in items_by_page.items():
+                entry = by_page[page_number]
+                entry["pii_found"] = merge(entry["pii_found"], items)
+                answers.setdefault(page_number, []).extend(items)
+                if not answered:
+                    failed.add(page_number)
+            for page_number, _ in pack:
+                pieces_left[page_number] -= 1
+                # Only pages whose every piece got a well-formed answer are cached, so a failed page
+                # is retried on the next run
+                if pieces_left[page_number] == 0:
+                    items = answers.pop(page_number, [])
+                    if cache is not None and page_number not in failed:
+                        cache.put(by_page[page_number]["text"], items)
+            write_ready()
+
 
 def main():
-    if len(sys.argv) != 3:
-        print("Usage: python step2_analyze_pii.py <extracted_text.json> <output_dir>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Detect PII with a Presidio-first cascade and the Ollama LLM.")
+    parser.add_argument("input_file", help="step1 JSON file (extracted text)")
+    parser.add_argument("output_file")
+    parser.add_argument("--uncertain-low", type=float, default=UNCERTAIN_LOW,
+                        help="Presidio candidates at or above this score are considered")
+    parser.add_argument("--uncertain-high", type=float, default=UNCERTAIN_HIGH,
+                        help="candidates at or above this score are kept without the LLM")
+    parser.add_argument("--llm-all", action="store_true", help="send every non-empty page to the LLM")
+    parser.add_argument("--ollama-url", default=OLLAMA_URL)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="parallel LLM requests; match the server's OLLAMA_NUM_PARALLEL")
+    parser.add_argument("--stream", action="store_true", help="stream LLM responses")
+    parser.add_argument("--llm-cache", default=DEFAULT_LLM_CACHE_PATH,
+                        help="LLM response cache path (see manage_llm_cache.py)")
+    parser.add_argument("--no-llm-cache", action="store_true", help="always query the LLM")
+    parser.add_argument("--num-ctx", type=int, default=read_num_ctx(),
+                        help="model context size used to pack pages per request (default: from MODELFILE)")
+    args = parser.parse_args()
 
     system_prompt = load_system_prompt()
 
-    input_file = sys.argv[1]
-    output_file = sys.argv[2]
+    input_file = args.input_file
+    output_file = args.output_file
 
     pages = read_json_file(input_file)
-    language = detect_language(pages)
-    print(f"Language: {language}")
-
-    output_file = sys.argv[2]
-    with open(output_file, "w", encoding="utf-8") as f:
-        for page in pages:
-            text = page["content"].strip()
-            if len(text) < 2:
+    texts = [page["content"].strip() for page in pages]
+
+    # A page identical to an earlier one gets that page's answer, without the cheap pass or the LLM
+    first_page = {}
+    duplicate_of = {}
+    for i, text in enumerate(texts):
+        if not is_blank(text) and first_page.setdefault(text, i) != i:
+            duplicate_of[i] = first_page[text]
+
+    # Cheap pass over every page first; the LLM only sees pages the cheap pass can't settle.
+    # Pages are grouped by their own language, and each group's analyzer is loaded on first use.
+    entries = {}
+    for language, indices in group_by_language(texts).items():
+        if language is not None:
+            print(f"Language '{language}': {len(indices)} page(s)")
+        for i in indices:
+            page, text = pages[i], texts[i]
+            if is_blank(text):
                 print(f"Page {page['page_number']}: empty, skipping")
                 continue
+            if i in duplicate_of:
+                continue
 
-            llm_response = call_ollama(text, system_prompt)
-            print(f"  LLM response: {llm_response[:100]}...")
-
-            try:
-                page_pii = json.loads(llm_response)
-            except json.JSONDecodeError:
-                print(f"  Warning: failed to parse LLM response")
-                page_pii = []
-
-            result = {"page_number": page["page_number"], "pii_found": page_pii}
-            f.write(json.dumps(result, ensure_ascii=False, indent=2) + "\n")
-            f.flush()
-
+            candidates = cheap_pass(text, analyzer_for(language), language, args.uncertain_low)
+            entries[i] = {"page_number": page["page_number"], "text": text, "content": page["content"],
+                          "candidates": candidates,
+                          "reasons": llm_triggers(text, candidates, args.uncertain_low, args.uncertain_high),
+                          "pii_found": confident(candidates, args.uncertain_high)}
+    for i, first in duplicate_of.items():
+        original = entries[first]
+        entries[i] = {"page_number": pages[i]["page_number"], "text": texts[i], "content": pages[i]["content"],
+                      "candidates": [], "reasons": [], "pii_found": [], "duplicate_of": original}
+        print(f"Page {pages[i]['page_number']}: same text as page {original['page_number']}, reusing its result")
+    work = [entries[i] for i in sorted(entries)]
+
+    # Values the cheap pass is sure of, from every page, settle partial names document-wide
+    propagator = Propagator()
+    for entry in work:
+        propagator.add_items(entry["pii_found"], entry["page_number"])
+    settled = settle_partial_names(work, propagator)
+    print(f"Partial names settled by full names elsewhere in the document on {settled} page(s)")
+
+    for entry in work:
+        del entry["candidates"]
+        if "duplicate_of" in entry:
+            continue
+        if args.llm_all and not entry["reasons"]:
+            entry["reasons"] = ["--llm-all"]
+        if entry["reasons"]:
+            print(f"Page {entry['page_number']}: sending to LLM ({', '.join(entry['reasons'])})")
+        else:
+            print(f"Page {entry['page_number']}: settled by the cheap pass, LLM skipped")
+
+    cache = None if args.no_llm_cache else open_llm_cache(args.llm_cache, args.model, system_prompt)
+
+    async def run():
+        async with AsyncOllamaClient(args.ollama_url, args.model, concurrency=args.concurrency,
+                                     stream=args.stream) as client:
+            await resolve_pages(work, client, system_prompt, output_file, page_budget(system_prompt, args.num_ctx),
+                                propagator, cache)
+
+    asyncio.run(run())
+
+    if cache is not None:
+        print(f"LLM cache: {cache.stats()}")
+        cache.close()
+
+    skipped = sum(1 for entry in work if not entry["reasons"])
+    print(f"LLM skipped for {skipped} of {len(work)} non-empty pages")
     print(f"Results saved to {output_file}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
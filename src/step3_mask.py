@@ -0,0 +1,99 @@
+import argparse
+import json
+import time
+from pathlib import Path
+
+from pii_detector.boxes import boxes_path, indexed_text_lengths
+from pii_detector.extract import extract_pages, write_jsonl
+from pii_detector.masking import Placeholders, mask_text, redact_pdf
+from pii_detector.pages import iter_step1, read_step2
+
+
+def page_texts(pdf_path, step1_file=None, workers=1):
+    """(page_number, text) pairs from the step1 file if given, else extracted from the PDF again."""
+    if step1_file is not None:
+        for page in iter_step1(step1_file):
+            yield page["page_number"], page["text"] if "text" in page else page["content"]
+    else:
+        for page_num, text in extract_pages(pdf_path, workers=workers):
+            yield page_num + 1, text
+
+
+def step1_boxes(step1_file):
+    """The box index saved with step1_file, if there is one and it still matches the step1 text."""
+    path = boxes_path(step1_file)
+    if not path.exists():
+        return None
+    lengths = indexed_text_lengths(path)
+    for page_number, text in page_texts(None, step1_file):
+        if lengths.get(page_number) != len(text):
+            print(f"Warning: {path} doesn't match {step1_file}, ignoring it")
+            return None
+    return path
+
+
+def mask_document(pdf_path, step2_file, output_dir: Path, step1_file=None, workers=1, pdf=True, text=True,
+                  mapping=False):
+    """Step 3: write a redacted PDF and a placeholder-masked text copy of a document from its step2 detections.
+
+    The character boxes saved by step1_extract --boxes are used when they sit
+    next to step1_file. Returns the paths written.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stem = Path(pdf_path).stem
+    detections = read_step2(step2_file)
+    written = []
+
+    if pdf:
+        output_file = output_dir / f"{stem}_redacted.pdf"
+        boxes_file = step1_boxes(step1_file) if step1_file is not None else None
+        if boxes_file is not None:
+            print(f"Using character boxes from {boxes_file}")
+        started = time.time()
+        stats = redact_pdf(pdf_path, detections, output_file, workers=workers, boxes_file=boxes_file)
+        elapsed = time.time() - started
+        print(f"Redacted {stats['redactions']} area(s) on {stats['pages']} pages in {elapsed:.1f}s "
+              f"({stats['pages'] / max(elapsed, 1e-9):.1f} pages/s, {stats['fallbacks']} found by text search)")
+        written.append(output_file)
+
+    if text:
+        placeholders = Placeholders()
+        output_file = output_dir / f"{stem}_masked.jsonl"
+        records = ({"page_number": page_number, "text": mask_text(page_text, detections.get(page_number, []),
+                                                                  placeholders)}
+                   for page_number, page_text in page_texts(pdf_path, step1_file, workers))
+        count = write_jsonl(records, output_file, {"filename": Path(pdf_path).name, "masked": True})
+        print(f"Masked text of {count} pages with {len(placeholders.values)} placeholder(s)")
+        written.append(output_file)
+
+        if mapping:
+            # Holds the original values: keep it away from the masked output
+            mapping_file = output_dir / f"{stem}_placeholders.json"
+            with open(mapping_file, "w", encoding="utf-8") as f:
+                json.dump(placeholders.values, f, indent=2, ensure_ascii=False)
+            written.append(mapping_file)
+
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Step 3: redact a PDF and mask its text using step2 detections.")
+    parser.add_argument("pdf_path")
+    parser.add_argument("step2_file", help="detections: step2 JSON, JSONL or .dets, or step2_v2 output")
+    parser.add_argument("--step1", default=None,
+                        help="step1 file the detections were made from (default: extract the text again)")
+    parser.add_argument("--output-dir", type=Path, default=Path("output/step3"))
+    parser.add_argument("--workers", type=int, default=1, help="processes redacting page ranges in parallel")
+    parser.add_argument("--no-pdf", action="store_true", help="skip the redacted PDF")
+    parser.add_argument("--no-text", action="store_true", help="skip the masked text")
+    parser.add_argument("--mapping", action="store_true",
+                        help="also write <stem>_placeholders.json mapping placeholders to the original values")
+    args = parser.parse_args()
+
+    try:
+        written = mask_document(args.pdf_path, args.step2_file, args.output_dir, args.step1, args.workers,
+                                pdf=not args.no_pdf, text=not args.no_text, mapping=args.mapping)
+    except ValueError as e:
+        parser.error(str(e))
+    for path in written:
+        print(f"Step 3 saved: {path}")
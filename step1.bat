@@ -1 +1 @@
-python src/step1_extract_text.py data/5.pdf output/step1/5.json
+python src/step1_extract_text.py data/5.pdf output/step1/5.json --boxes
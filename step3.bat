@@ -0,0 +1 @@
+python src/step3_mask.py data/5.pdf output/step2/5_detections.json --step1 output/step1/5.json